@@ -1,164 +1,174 @@
-import concurrent.futures
-import pandas as pd
+import argparse
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
 import string
 import logging
 
+from src.data.crawl_ledger import CrawlLedger, DONE, FAILED, INVALID
+from src.data.crawler import FetchConfig, crawl
+from src.data.detail_parser import parse_detail_page
+from src.data.discovery import discover_idps
+from src.data.editions import IDP_PREFIXES, RACE_YEAR, parse_years, year_dir
+from src.data.page_cache import CACHE_DIR, PageCache
+from src.data.race_store import build_store
+from src.data.split_sink import PROCESSED_DIR, RAW_DIR, SplitSink
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', handlers=[logging.StreamHandler()])
 
+DETAIL_URL = 'https://results.baa.org/{year}/?content=detail&fpid=search&pid=search&idp={idp}'
+
+# Crawl state is kept per edition so an interrupted sweep can resume
+LEDGER_PATH = os.path.join('data', 'interim', 'crawl_ledger_{year}.sqlite')
+
+
+def results_url(year=RACE_YEAR):
+    # Detail URL up to the edition's shared idp prefix, for brute-force sweeps
+    if year not in IDP_PREFIXES:
+        raise ValueError(f"No known idp prefix for {year}; crawl it from the results listing instead")
+    return DETAIL_URL.format(year=year, idp=IDP_PREFIXES[year])
+
+
+def build_urls(year=RACE_YEAR):
+    # Sweep the last four characters of the idp: the first is A-F, the other
+    # three are hex digits (0-9, A-F), appended to the detail URL for the year
+    combinations = []
+
+    alphabet = string.digits+string.ascii_uppercase[0:6]
+    for a in string.ascii_uppercase[0:6]:
+        for b in alphabet:
+            for c in alphabet:
+                for d in alphabet:
+                    combinations.append(f'{a}{b}{c}{d}')
+
+    prefix = results_url(year)
+    return [f'{prefix}{combination}' for combination in combinations]
+
+
+def idp_from_url(url):
+    return parse_qs(urlsplit(url).query)['idp'][0]
+
+
+def year_from_url(url):
+    return int(urlsplit(url).path.strip('/'))
+
+
+def open_sink(year, **kwargs):
+    # Each edition writes its own copies of the output files
+    return SplitSink(year_dir(RAW_DIR, year), year_dir(PROCESSED_DIR, year), **kwargs)
+
+
+def collect_results(urls, year=RACE_YEAR, config=None, ledger_path=None, cache=None):
+    ledger_path = ledger_path or LEDGER_PATH.format(year=year)
+    ledger = CrawlLedger(ledger_path)
+    # Keep appending to the output files only when resuming an earlier sweep
+    resume = ledger.counts().get(DONE, 0) > 0
+
+    # Skip idps that a previous run already finished
+    urls_by_idp = {idp_from_url(url): url for url in urls}
+    todo = [urls_by_idp[idp] for idp in ledger.pending(urls_by_idp)]
+    logging.info(f"{len(urls) - len(todo)} URLs already finished, {len(todo)} left to check")
+    if not todo:
+        # Nothing to fetch (all done, or discovery found no runners): leave the outputs as they are
+        ledger.close()
+        return
+
+    def on_flush(idps):
+        # Runners only count as done once they are on disk
+        for idp in idps:
+            ledger.mark(idp, DONE)
+        ledger.commit()
+
+    sink = open_sink(year, resume=resume, on_flush=on_flush)
+    checked = 0
 
-def process_url(url):
-    # Read the table from the website
-    
-    RaceTime = pd.DataFrame()
-    MinMile = pd.DataFrame()
-    MilesPerHour= pd.DataFrame()
-    
-    tables = pd.read_html(url)
-
-    name = tables[0].iloc[0, :]
-    bib = tables[0].iloc[2, :]
-
-    # Create a DataFrame from name and bib
-    df = pd.DataFrame({'name': name, 'bib': bib})
-    
-    # Drop the first row
-    df = df.drop(0)
-
-    # Assuming the table you want is the first one
-    times = tables[3]
-    # Convert the times to a DataFrame
-    df_times = pd.DataFrame(times)
-
-    # Check for '-' in name or times DataFrame
-    if '-' in df['name'].values or '-' in df_times.values:
-        return None, None, None
-    
-    realdata = df_times.iloc[0:14, 0]
-    # Delete the rows in realdata that contain '*'
-    realdata = realdata[~realdata.str.contains(r'\*', regex=True)]
-    
-    # Check if df_times has enough rows to drop
-    if df_times.shape[0] < 14 or realdata.shape[0] < 14:
-        return None, None, None
-    
-    # Drop the first row
-    df_times = df_times.drop([7, 8, 10, 11, 13])
-    
-        # Check if df_times has enough columns
-    if df_times.shape[1] < 6:
-        return None, None, None
-    
-    # I want to keep the Split column and the time columns
-    RaceTime = df_times.iloc[:, [0, 2]].T
-    MinMile = df_times.iloc[:, [0, 4]].T
-    MilesPerHour = df_times.iloc[:, [0, 5]].T
-
-    # Set the first row as the column names for RaceTime
-    RaceTime.columns = RaceTime.iloc[0]
-    RaceTime = RaceTime.drop(RaceTime.index[0])
-
-    # Set the first row as the column names for MinMile
-    MinMile.columns = MinMile.iloc[0]
-    MinMile = MinMile.drop(MinMile.index[0])
-
-    # Set the first row as the column names for MilesPerHour
-    MilesPerHour.columns = MilesPerHour.iloc[0]
-    MilesPerHour = MilesPerHour.drop(MilesPerHour.index[0])
-
-    # Join df and RaceTime
-    RaceTime = pd.concat([df.reset_index(drop=True), RaceTime.reset_index(drop=True)], axis=1)
-    MinMile = pd.concat([df.reset_index(drop=True), MinMile.reset_index(drop=True)], axis=1)
-    MilesPerHour = pd.concat([df.reset_index(drop=True), MilesPerHour.reset_index(drop=True)], axis=1)
-
-    return RaceTime, MinMile, MilesPerHour
-
-# List of URLs to process
-# urls_list = [
-#     'https://results.baa.org/2024/?content=detail&fpid=search&pid=search&idp=9TGHS6FF19CD8B',
-#     'https://results.baa.org/2024/?content=detail&fpid=search&pid=search&idp=9TGHS6FF19ED5B',
-#     'https://results.baa.org/2024/?content=detail&fpid=search&pid=search&idp=9TGHS6FF19AA1A',
-#     'https://results.baa.org/2024/?content=detail&fpid=search&pid=search&idp=9TGHS6FF19AA0D'
-# ]
-
-#Create a list of all possible combinations of 'AA2A' to 'ZZ9Z'
-combinations = []
-  
-alphabet = string.digits+string.ascii_uppercase[0:6]  
-for a in string.ascii_uppercase[0:6]:
-    for b in alphabet:
-        for c in alphabet:
-            for d in alphabet:
-                combinations.append(f'{a}{b}{c}{d}')
-                
-# append the combinations to the end of the URL
-url = str('https://results.baa.org/2024/?content=detail&fpid=search&pid=search&idp=9TGHS6FF19')
-
-urls = [f'{url}{combination}' for combination in combinations]
-
-# Initialize empty lists to store results
-all_RaceTime = []
-all_MinMile = []
-all_MilesPerHour = []
-checked = 0
-
-
-def process_url_wrapper(url):
-    RaceTime, MinMile, MilesPerHour = process_url(url)
-    return RaceTime, MinMile, MilesPerHour, url
-
-# Use ThreadPoolExecutor to process URLs in parallel
-with concurrent.futures.ThreadPoolExecutor(max_workers=256) as executor:
-    futures = [executor.submit(process_url_wrapper, url) for url in urls]
-    for future in concurrent.futures.as_completed(futures):
-        RaceTime, MinMile, MilesPerHour, url = future.result()
-        if RaceTime is not None and MinMile is not None and MilesPerHour is not None:
-            all_RaceTime.append(RaceTime)
-            all_MinMile.append(MinMile)
-            all_MilesPerHour.append(MilesPerHour)
+    def on_result(url, record, error):
+        nonlocal checked
+        idp = idp_from_url(url)
+        if error is not None:
+            logging.warning(f"{url} failed: {error}")
+            ledger.mark(idp, FAILED, str(error))
+        elif record is None or not sink.append(idp, record):
+            ledger.mark(idp, INVALID)
         checked += 1
-        logging.info(f"{url} finished, {len(all_RaceTime)} Runners collected, {round(checked/len(urls)*100, 3)}% of URLs Checked")
-
-# Concatenate all results into DataFrames
-df_RaceTime = pd.concat(all_RaceTime, ignore_index=True)
-df_MinMile = pd.concat(all_MinMile, ignore_index=True)
-df_MilesPerHour = pd.concat(all_MilesPerHour, ignore_index=True)
-
-
-#if Finish Net is empty, then use Finish Net * as the final time
-df_RaceTime['Finish Net'] = df_RaceTime['Finish Net'].fillna(df_RaceTime['Finish Net *'])
-df_MilesPerHour['Finish Net'] = df_MilesPerHour['Finish Net'].fillna(df_MilesPerHour['Finish Net *'])
-df_MinMile['Finish Net'] = df_MinMile['Finish Net'].fillna(df_MinMile['Finish Net *'])
-
-#Remove the Finish Net * column
-df_RaceTime = df_RaceTime.drop(columns=['Finish Net *'])
-df_MilesPerHour = df_MilesPerHour.drop(columns=['Finish Net *'])
-df_MinMile = df_MinMile.drop(columns=['Finish Net *'])
-
-# RaceTimeSeconds = df_RaceTime.iloc[:,2:]
-
-
-# # drop rows with '-' in the time   
-# for i in range(2:):
-#     RaceTimeSeconds = RaceTimeSeconds.drop(RaceTimeSeconds[RaceTimeSeconds[col] == '–'].index)
-    
-cols = df_RaceTime.columns[2:]
-
-# drop rows with '-' in the time   
-for col in cols:
-    df_RaceTime = df_RaceTime.drop(df_RaceTime[df_RaceTime[col] == '–'].index)
-    df_MilesPerHour = df_MilesPerHour.drop(df_MilesPerHour[df_MilesPerHour[col] == '–'].index)
-    df_MinMile = df_MinMile.drop(df_MinMile[df_MinMile[col] == '–'].index)
-        
-RaceTimeSeconds = df_RaceTime.iloc[:,2:]
-RaceTimeSeconds = RaceTimeSeconds.apply(lambda x: pd.to_datetime(x, format='%H:%M:%S').dt.time)
-# convert to seconds
-RaceTimeSeconds = RaceTimeSeconds.apply(lambda x: x.apply(lambda y: y.hour*3600 + y.minute*60 + y.second))
-
-RaceTimeSeconds = pd.concat([df_RaceTime.iloc[:,0:2], RaceTimeSeconds], axis=1)
-
-# Save the DataFrames to CSV files
-df_RaceTime.to_csv('data\\Raw\\RaceTime.csv', index=False)
-df_MinMile.to_csv('data\\Raw\\MinMile.csv', index=False)
-df_MilesPerHour.to_csv('data\\Raw\\MilesPerHour.csv', index=False)
-RaceTimeSeconds.to_csv('data\\Processed\\RaceTimeSeconds.csv', index=False)
\ No newline at end of file
+        logging.info(f"{url} finished, {sink.written + sink.count} Runners collected, {round(checked/len(todo)*100, 3)}% of URLs Checked")
+
+    # Fetch pages over one pooled connection set
+    try:
+        asyncio.run(crawl(todo, parse_detail_page, on_result, config or FetchConfig(), cache=cache))
+    finally:
+        sink.close()
+        logging.info(f"Crawl ledger {ledger_path}: {ledger.counts()}")
+        ledger.close()
+
+
+def replay_cache(cache, year=RACE_YEAR):
+    # Rebuild an edition's output files from cached pages without touching the network
+    with open_sink(year) as sink:
+        for url, html in cache.items():
+            if 'idp=' not in url or year_from_url(url) != year:
+                continue
+            record = parse_detail_page(html) if html is not None else None
+            if record is not None:
+                sink.append(idp_from_url(url), record)
+    logging.info(f"Replayed {year} from {len(cache)} cached pages, {sink.written} Runners written")
+
+
+def discover_urls(year=RACE_YEAR, config=None):
+    # Detail URLs for every runner linked from the edition's results listing
+    idps = asyncio.run(discover_idps(year, config))
+    return [DETAIL_URL.format(year=year, idp=idp) for idp in idps]
+
+
+def ingest_year(year, enumerate_ids=False, replay=False, cache_dir=CACHE_DIR):
+    # Crawl (or replay) one edition and rebuild its partition of the race store.
+    # Runs in its own process when several years are ingested at once; the page
+    # cache is shared, since pages are keyed by URL and the URL holds the year.
+    cache = PageCache(cache_dir) if cache_dir else None
+    try:
+        if replay:
+            replay_cache(cache, year)
+        else:
+            urls = build_urls(year) if enumerate_ids else discover_urls(year)
+            collect_results(urls, year, cache=cache)
+        build_store(year=year)
+    finally:
+        if cache is not None:
+            cache.close()
+    return year
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Collect split times from results.baa.org.')
+    parser.add_argument('--year', nargs='+', default=[str(RACE_YEAR)],
+                        help='Editions to collect, e.g. 2024 or 2019-2024; each runs in its own process')
+    parser.add_argument('--enumerate', action='store_true',
+                        help='Guess idps by brute force instead of reading the results listing')
+    parser.add_argument('--replay', action='store_true',
+                        help='Re-parse every cached detail page offline instead of crawling')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not read or fill the raw page cache')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='Location of the raw page cache')
+    args = parser.parse_args()
+
+    if args.replay and args.no_cache:
+        parser.error('--replay needs the page cache')
+    years = parse_years(args.year)
+    cache_dir = None if args.no_cache else args.cache_dir
+    if len(years) == 1:
+        ingest_year(years[0], args.enumerate, args.replay, cache_dir)
+        return
+    with ProcessPoolExecutor(len(years)) as pool:
+        futures = {pool.submit(ingest_year, year, args.enumerate, args.replay, cache_dir): year
+                   for year in years}
+        for future in futures:
+            try:
+                logging.info(f"Finished {future.result()}")
+            except Exception as e:
+                logging.error(f"Ingesting {futures[future]} failed: {e}")
+
+
+if __name__ == '__main__':
+    main()
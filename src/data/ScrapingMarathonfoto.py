@@ -5,11 +5,24 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from flask import Flask, render_template_string, request
-from threading import Thread
-import pandas as pd
-import time
+from flask import Flask, jsonify, redirect, render_template, request, url_for
+from threading import Event, Thread
+import argparse
+import uuid
+from functools import partial
 import os
+import asyncio
+import time
+
+from src.data.build_thumbnails import THUMB_DIR, asset_version
+from src.data.label_metrics import (DECISION, PHOTO_LOAD, PHOTO_WAIT, SELECTION_PAGE, SUBMIT, TAB_CLEANUP,
+                                    MetricsLog)
+from src.data.editions import RACE_YEAR
+from src.data.label_queue import LEASE_SECONDS, LeaseQueue
+from src.data.label_store import open_label_store
+from src.data.photo_prefetch import PhotoPrefetcher
+from src.data.photo_resolver import PhotoUrlCache, resolve_photo_urls
+from src.data.race_store import load_seconds
 
 
 # Add options to make Chrome more stable
@@ -23,9 +36,37 @@ def create_chrome_driver() -> webdriver.Chrome:
     return webdriver.Chrome(service=Service(), options=options)
 
 
-driver = create_chrome_driver()
+# Number of browser sessions loading upcoming runners' photos in the background
+PREFETCH_SESSIONS = 3
+# Runners shown together on one /batch page
+BATCH_SIZE = 6
+RESULTS_URL = f"https://results.baa.org/{RACE_YEAR}/"
 
 app = Flask(__name__)
+# Static URLs carry a content hash (see thumbnail_url), so browsers may keep
+# them for a year; Flask adds ETags and answers revalidation with 304s
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 365 * 24 * 3600
+# Set by /submit so the labeling loop moves on as soon as a shoe is picked
+shoe_selected = Event()
+# Shared runner queue and gallery URLs when running as a multi-labeler server
+label_queue = None
+photo_urls = None
+# Stage timings of this session, summarised by python -m src.data.label_metrics
+metrics = MetricsLog()
+
+
+@app.template_global()
+def thumbnail_url(image):
+    """Versioned URL of a shoe image's thumbnail (built by src.data.build_thumbnails)."""
+    filename = os.path.splitext(image)[0] + '.jpg'
+    version = asset_version(os.path.join(THUMB_DIR, filename))
+    return url_for('static', filename=f'thumbs/{filename}', v=version)
+
+@app.after_request
+def cache_static(response):
+    if request.endpoint == 'static':
+        response.cache_control.immutable = True
+    return response
 
 @app.route('/')
 def index():
@@ -33,95 +74,17 @@ def index():
     name = request.args.get('name')
     shoes = Shoes
     runners_left = request.args.get('runners_left')
-    return render_template_string('''
-        <!doctype html>
-        <html lang="en">
-        <head>
-            <meta charset="utf-8">
-            <title>Select Shoe</title>
-            <style>
-                body {
-                    background-color: #121212;
-                    color: #e0e0e0;
-                    font-family: Arial, sans-serif;
-                }
-                h1 {
-                    text-align: center;
-                    margin-top: 20px;
-                }
-                .shoe-container {
-                    display: flex;
-                    flex-wrap: wrap;
-                    justify-content: center;
-                }
-                .shoe-image {
-                    display: inline-block;
-                    margin: 10px;
-                    padding: 20px;
-                    border: 1px solid #444;
-                    border-radius: 10px;
-                    cursor: pointer;
-                    text-align: center;
-                    background-color: #1e1e1e;
-                    transition: transform 0.2s;
-                }
-                .shoe-image:hover {
-                    transform: scale(1.05);
-                }
-                .shoe-image img {
-                    max-width: 400px;
-                    max-height: 400px;
-                }
-                .shoe-image p {
-                    margin-top: 10px;
-                    font-size: 1.1em;
-                }
-                form {
-                    display: none;
-                }
-                .counter {
-                    text-align: center;
-                    margin-bottom: 20px;
-                    font-size: 1.2em;
-                }
-            </style>
-        </head>
-        <body>
-            <h1>Select Shoe for {{ name }} (Bib: {{ bib }})</h1>
-            <div class="counter">
-                Runners left: {{ runners_left }}
-            </div>
-            <div class="shoe-container">
-                {% for shoe in shoes %}
-                    <div class="shoe-image" onclick="selectShoe('{{ shoe }}')">
-                        <img src="{{ url_for('static', filename=shoe_images[shoe]) }}" alt="{{ shoe }}">
-                        <p>{{ shoe }}</p>
-                    </div>
-                {% endfor %}
-            </div>
-            <form id="shoeForm" method="post" action="/submit">
-                <input type="hidden" name="bib" value="{{ bib }}">
-                <input type="hidden" name="name" value="{{ name }}">
-                <input type="hidden" name="shoe_choice" id="shoe_choice">
-            </form>
-            <script>
-                function selectShoe(shoe) {
-                    document.getElementById('shoe_choice').value = shoe;
-                    document.getElementById('shoeForm').submit();
-                }
-            </script>
-        </body>
-        </html>
-    ''', bib=bib, name=name, shoes=shoes, shoe_images=shoe_images, runners_left=runners_left)
+    return render_template('select_shoe.html', bib=bib, name=name, shoes=shoes, shoe_images=shoe_images,
+                           runners_left=runners_left, action='/submit', labeler='', photo_url=None)
 
 @app.route('/submit', methods=['POST'])
 def submit():
     bib = request.form['bib']
     name = request.form['name']
     shoe_choice = request.form['shoe_choice']
-    save_shoe_choice(bib, name, shoe_choice)
-    global user_has_selected_shoe
-    user_has_selected_shoe = True
+    with metrics.timed(bib, SUBMIT):
+        save_shoe_choice(bib, name, shoe_choice)
+    shoe_selected.set()
     return '''
         <script>
             window.close();
@@ -129,15 +92,74 @@ def submit():
         Shoe choice submitted successfully!
     '''
 
+@app.route('/label')
+def label():
+    # Every browser gets its own labeler id so its lease can be found again
+    labeler = request.args.get('labeler')
+    if not labeler:
+        return redirect(url_for('label', labeler=uuid.uuid4().hex[:8]))
+    lease = label_queue.lease(labeler)
+    if lease is None:
+        return 'No runners left to label. Thank you!'
+    photo_url = photo_urls.get(lease.bib) or RESULTS_URL
+    return render_template('select_shoe.html', bib=lease.bib, name=lease.name, shoes=Shoes,
+                           shoe_images=shoe_images, runners_left=label_queue.counts()['pending'],
+                           action=url_for('label_submit'), labeler=labeler, photo_url=photo_url)
+
+@app.route('/label/submit', methods=['POST'])
+def label_submit():
+    labeler = request.form['labeler']
+    bib = request.form['bib']
+    with metrics.timed(bib, SUBMIT, labeler=labeler):
+        lease = label_queue.complete(bib, labeler, request.form['name'], request.form['shoe_choice'])
+    if lease is not None:
+        metrics.record(bib, DECISION, time.time() - lease.leased, labeler=labeler)
+    return redirect(url_for('label', labeler=labeler))
+
+@app.route('/batch')
+def batch():
+    labeler = request.args.get('labeler')
+    size = request.args.get('size', BATCH_SIZE, type=int)
+    if not labeler:
+        return redirect(url_for('batch', labeler=uuid.uuid4().hex[:8], size=size))
+    leases = label_queue.lease_batch(labeler, size)
+    if not leases:
+        return 'No runners left to label. Thank you!'
+    runners = [{'bib': lease.bib, 'name': lease.name, 'photo_url': photo_urls.get(lease.bib) or RESULTS_URL}
+               for lease in leases]
+    return render_template('batch_select.html', runners=runners, shoes=Shoes, shoe_images=shoe_images,
+                           runners_left=label_queue.counts()['pending'],
+                           action=url_for('batch_submit', size=size), labeler=labeler)
+
+@app.route('/batch/submit', methods=['POST'])
+def batch_submit():
+    labeler = request.form['labeler']
+    bibs = request.form.getlist('bib')
+    picked = [(bib, request.form[f'name_{bib}'], request.form[f'shoe_{bib}'])
+              for bib in bibs if request.form.get(f'shoe_{bib}')]
+    # Runners left without a pick go back to the front of the queue
+    label_queue.release([bib for bib in bibs if not request.form.get(f'shoe_{bib}')], labeler)
+    with metrics.timed(','.join(bib for bib, _, _ in picked), SUBMIT, labeler=labeler, batch=len(picked)):
+        leases = label_queue.complete_batch(picked, labeler)
+    # Spread the time spent on the page over the runners labeled on it
+    now = time.time()
+    for (bib, _, _), lease in zip(picked, leases):
+        if lease is not None:
+            metrics.record(bib, DECISION, (now - lease.leased) / len(picked), labeler=labeler, batch=len(picked))
+    return redirect(url_for('batch', labeler=labeler, size=request.args.get('size', BATCH_SIZE, type=int)))
+
+@app.route('/status')
+def status():
+    return jsonify(label_queue.counts())
+
 def save_shoe_choice(bib, name, shoe_choice):
-    with open('D:\\BAAFootwear\\data\\Raw\\ShoeChoices.csv', 'a') as f:
-        f.write(f"{bib},{name},{shoe_choice}\n")
+    labels.save(bib, name, shoe_choice)
 
 def show_shoe_selection_page(driver, bib, name, runners_left):
     url = f"http://127.0.0.1:5000/?bib={bib}&name={name}&runners_left={runners_left}"
     driver.get(url)
 
-def getMarathonFoto(Bib, LastName, Url):
+def getMarathonFoto(driver, Bib, LastName, Url=RESULTS_URL):
     # Store the original window handle
     original_window = driver.current_window_handle
     
@@ -159,14 +181,25 @@ def getMarathonFoto(Bib, LastName, Url):
         EC.presence_of_element_located((By.PARTIAL_LINK_TEXT, "Marathonfoto.com"))
     )
 
+    handles = driver.window_handles
     driver.find_element(By.PARTIAL_LINK_TEXT, "Marathonfoto.com").click()
+    # The gallery opens in a new tab; wait for it so close_other_tabs can find it
+    WebDriverWait(driver, 10).until(EC.new_window_is_opened(handles))
     
     return original_window
 
+def openPhotoGallery(driver, Bib, LastName, photo_urls):
+    # Go straight to the gallery when its URL has been resolved, otherwise
+    # fall back to clicking through the results search
+    url = photo_urls.get(Bib)
+    with metrics.timed(Bib, PHOTO_LOAD, direct=url is not None):
+        if url is None:
+            return getMarathonFoto(driver, Bib, LastName)
+        driver.get(url)
+        return driver.current_window_handle
+
 def close_other_tabs(driver, original_window):
-    # Wait for the new tab to open and switch to it
-    time.sleep(2)  # Give time for new tabs to open
-    
+    # No need to wait here: getMarathonFoto only returns once the gallery tab exists
     # Get all window handles
     for window_handle in driver.window_handles:
         if window_handle != original_window:
@@ -177,28 +210,20 @@ def close_other_tabs(driver, original_window):
     # Switch back to the original tab
     driver.switch_to.window(original_window)
 
-RaceTimeSeconds = pd.read_csv('D:\\BAAFootwear\\data\\Processed\\RaceTimeSeconds.csv', encoding='latin1')
-
-def get_processed_bibs():
-    shoe_choices_path = 'D:\\BAAFootwear\\data\\Raw\\ShoeChoices.csv'
-
-    if not os.path.exists(shoe_choices_path):
-        return set()
-    
-    try:
-        processed = pd.read_csv(shoe_choices_path, header=None, names=['bib', 'name', 'shoe'], encoding='latin1')
-        return set(processed['bib'].astype(str))
-    except pd.errors.EmptyDataError:
-        return set()
+# Runners of the edition being labeled; their labels are saved under that year
+RaceTimeSeconds = load_seconds(years=[RACE_YEAR])
+# Labels are written here as they are made; new rows in ShoeChoices.csv are merged in on open
+labels = open_label_store(year=RACE_YEAR)
 
 #create a def that get all of the runners under a certain time
 def getRunnersUnderTime(timeSeconds):
     # Get all runners under the time limit
-    runners = RaceTimeSeconds[RaceTimeSeconds['Finish Net'] < timeSeconds].reset_index(drop=True)
+    # A finish of -1 means the time is missing from the store
+    finished = RaceTimeSeconds['Finish Net'] > 0
+    runners = RaceTimeSeconds[finished & (RaceTimeSeconds['Finish Net'] < timeSeconds)].reset_index(drop=True)
     
     # Filter out already processed runners
-    processed_bibs = get_processed_bibs()
-    unprocessed_runners = runners[~runners['bib'].astype(str).isin(processed_bibs)].reset_index(drop=True)
+    unprocessed_runners = runners[~runners['bib'].isin(labels.processed)].reset_index(drop=True)
     
     return unprocessed_runners
 
@@ -255,30 +280,71 @@ shoe_images = {
     'Question Mark': 'question_mark.jpg'
 }
     
-if __name__ == '__main__':
+def serve(host, port, lease_seconds):
+    """Hand out runners to any number of labelers connecting to /label."""
+    global label_queue
+    label_queue = LeaseQueue(zip(bib, names), labels, lease_seconds)
+    app.run(host=host, port=port, threaded=True)
+
+def label_locally():
+    """Label one runner after another with the photos opened by Selenium on this machine."""
     # Run the Flask app in a separate thread
     flask_thread = Thread(target=app.run, kwargs={'debug': True, 'use_reloader': False})
     flask_thread.start()
     
     # Open a new browser tab once
     selection_driver = create_chrome_driver()
-    # for each runner, get their marathonfoto
-    for i in range(len(names)):
-        user_has_selected_shoe = False
+    # Load the next few runners' marathonfotos in background sessions while
+    # the current one is being labeled
+    prefetcher = PhotoPrefetcher(zip(bib, names), partial(openPhotoGallery, photo_urls=photo_urls),
+                                 create_chrome_driver, size=PREFETCH_SESSIONS)
+    waiting = time.perf_counter()
+    for i, runner in enumerate(prefetcher):
+        metrics.record(runner.bib, PHOTO_WAIT, time.perf_counter() - waiting)
+        shoe_selected.clear()
         runners_left = len(names) - i
-        show_shoe_selection_page(selection_driver, bib[i], names[i], runners_left)
-        original_window = getMarathonFoto(bib[i], names[i], "https://results.baa.org/2024/")
+        with metrics.timed(runner.bib, SELECTION_PAGE):
+            show_shoe_selection_page(selection_driver, runner.bib, runner.name, runners_left)
+            # Bring the already loaded photo page to the front
+            runner.driver.maximize_window()
         
-        while not user_has_selected_shoe:
-            time.sleep(1)
+        with metrics.timed(runner.bib, DECISION):
+            shoe_selected.wait()
         
         # Close any additional tabs that were opened
-        close_other_tabs(driver, original_window)
+        with metrics.timed(runner.bib, TAB_CLEANUP):
+            close_other_tabs(runner.driver, runner.original_window)
+        runner.release()
+        waiting = time.perf_counter()
     
     # Close the browser tab after all selections are done
+    prefetcher.close()
     selection_driver.quit()
-    driver.quit()
 
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Label the shoes of runners from their marathon photos.')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run a server that several labelers can use at once through /label')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--lease-timeout', type=float, default=LEASE_SECONDS,
+                        help='Seconds before an unfinished runner is handed to someone else')
+    args = parser.parse_args()
 
+    # Look up the gallery URLs over HTTP first; bibs resolved on earlier runs
+    # come straight from the cache
+    photo_urls = PhotoUrlCache()
+    asyncio.run(resolve_photo_urls(bib, photo_urls))
 
+    try:
+        if args.serve:
+            serve(args.host, args.port, args.lease_timeout)
+        else:
+            label_locally()
+    finally:
+        photo_urls.close()
+        metrics.close()
+        # Keep the shared CSV in step with the store
+        labels.export_csv()
+        labels.close()
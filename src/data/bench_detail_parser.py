@@ -0,0 +1,105 @@
+import argparse
+import glob
+import logging
+import os
+import time
+from io import StringIO
+from typing import Callable, List, Tuple
+
+import pandas as pd
+
+from src.data.detail_parser import RunnerRecord, parse_detail_page
+
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+FIXTURE_DIR = os.path.join('data', 'external', 'detail_pages')
+
+
+def record_to_frames(record: RunnerRecord):
+    """One-row RaceTime, MinMile and MilesPerHour frames, shaped like ``legacy_parse`` output."""
+    runner = {'name': record.name, 'bib': record.bib}
+    race_time = pd.DataFrame([{**runner, **{split.label: split.time for split in record.splits}}])
+    min_mile = pd.DataFrame([{**runner, **{split.label: split.min_mile for split in record.splits}}])
+    miles_per_hour = pd.DataFrame([{**runner, **{split.label: split.mph for split in record.splits}}])
+    return race_time, min_mile, miles_per_hour
+
+
+def legacy_parse(html: str):
+    """Reference implementation: the read_html based parsing the crawler used to do."""
+    tables = pd.read_html(StringIO(html))
+    if len(tables) < 4:
+        return None, None, None
+
+    df = pd.DataFrame({'name': tables[0].iloc[0, :], 'bib': tables[0].iloc[2, :]}).drop(0)
+    df_times = pd.DataFrame(tables[3])
+    if '-' in df['name'].values or '-' in df_times.values:
+        return None, None, None
+
+    realdata = df_times.iloc[0:14, 0]
+    realdata = realdata[~realdata.str.contains(r'\*', regex=True)]
+    if df_times.shape[0] < 14 or realdata.shape[0] < 14:
+        return None, None, None
+
+    df_times = df_times.drop([7, 8, 10, 11, 13])
+    if df_times.shape[1] < 6:
+        return None, None, None
+
+    frames = []
+    for column in (2, 4, 5):
+        frame = df_times.iloc[:, [0, column]].T
+        frame.columns = frame.iloc[0]
+        frame = frame.drop(frame.index[0])
+        frames.append(pd.concat([df.reset_index(drop=True), frame.reset_index(drop=True)], axis=1))
+    return tuple(frames)
+
+
+def check_agreement(pages: List[Tuple[str, str]]) -> None:
+    """Fail loudly if the two parsers disagree on any (name, html) fixture."""
+    for path, html in pages:
+        expected = legacy_parse(html)
+        record = parse_detail_page(html)
+        if record is None:
+            assert expected[0] is None, f"{path}: targeted parser rejected a page read_html accepts"
+            continue
+        assert expected[0] is not None, f"{path}: targeted parser accepted a page read_html rejects"
+        for old, new in zip(expected, record_to_frames(record)):
+            assert list(old.columns) == list(new.columns), f"{path}: columns differ"
+            assert old.astype(str).values.tolist() == new.astype(str).values.tolist(), f"{path}: values differ"
+
+
+def time_parser(parse: Callable[[str], object], pages: List[Tuple[str, str]], repeat: int) -> float:
+    """Average seconds per page over ``repeat`` passes."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, html in pages:
+            parse(html)
+    return (time.perf_counter() - start) / (repeat * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark detail-page parsing on saved HTML.')
+    parser.add_argument('fixtures', nargs='?', default=FIXTURE_DIR, help='Directory of saved detail pages')
+    parser.add_argument('--repeat', type=int, default=50, help='Passes over the fixture set')
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(args.fixtures, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            pages.append((os.path.basename(path), f.read()))
+    if not pages:
+        raise SystemExit(f"No .html fixtures found in {args.fixtures}")
+
+    check_agreement(pages)
+    logger.info(f"Both parsers agree on {len(pages)} pages")
+
+    legacy = time_parser(legacy_parse, pages, args.repeat)
+    targeted = time_parser(parse_detail_page, pages, args.repeat)
+    logger.info(f"pd.read_html:       {legacy * 1e6:10.1f} us/page")
+    logger.info(f"parse_detail_page:  {targeted * 1e6:10.1f} us/page")
+    logger.info(f"Speedup:            {legacy / targeted:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
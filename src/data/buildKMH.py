@@ -1,80 +1,58 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
+import os
 
+import matplotlib
 
-# Read the CSV file
-file_path = "D:/BAAFootwear/data/Raw/RaceTimeSeconds.csv"
-data = pd.read_csv(file_path)
-df = pd.DataFrame(data)
+from src.data.race_store import VIEW_METERS, load_seconds
+from src.features.segment_speed import segment_features
 
-# Define checkpoint distances in km
-distances = {
-    '5K': 5000,
-    '10K': 10000,
-    '15K': 15000,
-    '20K': 20000,
-    '25K': 25000,
-    '30K': 30000,
-    '35K': 35000,
-    '40K': 40000,
-    'Finish Net': 42200
-}
 
-#remove the Half column
-df = df.drop(columns=['HALF'])
+# Checkpoints to compare and the segment speeds are measured against;
+# the half split is left out
+CHECKPOINTS = [checkpoint for checkpoint in VIEW_METERS if checkpoint != 'HALF']
+BASELINE = '5K'
+OUT_PATH = os.path.join('reports', 'segment_speed_boxplot.png')
 
-# # First convert all times to hours
-# for key in distances:
-#     df[f'{key}_hours'] = (df[key]) / 3600
 
+def main():
+    parser = argparse.ArgumentParser(description='Boxplot of every runner\'s segment speeds.')
+    parser.add_argument('--out', default=OUT_PATH, help='Where the figure is saved')
+    parser.add_argument('--show', action='store_true', help='Also open the figure in a window')
+    args = parser.parse_args()
 
-df_speed = df.copy()
-# Calculate speeds between checkpoints
-checkpoints = list(distances.keys())
-for i in range(len(checkpoints)):  # Changed to include all checkpoints
-    current = checkpoints[i]
-    if i == 0: #for the first checkpoint
-        df_speed[current] = distances[current] / df[current]
-    else:
-        prev_point = checkpoints[i-1]
-        # Calculate time difference between checkpoints
-        time_diff = df[current] - df[prev_point]
-        # Calculate distance between checkpoints
-        distance_diff = distances[current] - distances[prev_point]
-        # Calculate speed between checkpoints
-        df_speed[current] = distance_diff / time_diff
+    # Without --show, draw without a display so the script also runs headless
+    if not args.show:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
 
-# checkpoints = list(distances.keys())
-# for i in range(len(checkpoints)):  # Changed to include all checkpoints
-#     current = checkpoints[i]
-#     if i == 0: #for the first checkpoint
-#         df[current] = distances[current] / df[f'{current}_hours']
-#     else:
-#         prev_point = checkpoints[i-1]
-#         # Calculate time difference between checkpoints
-#         time_diff = df[f'{current}_hours'] - df[f'{prev_point}_hours']
-#         # Calculate distance between checkpoints
-#         distance_diff = distances[current] - distances[prev_point]
-#         # Calculate speed between checkpoints
-#         df[current] = distance_diff / time_diff
+    # Read the split seconds from the race store, skipping runners that failed
+    # the quality screen
+    df = load_seconds(usable_only=True)
 
+    # Speeds between checkpoints and percent change relative to the baseline,
+    # computed for every runner at once (negative values indicate slower speeds)
+    features = segment_features(
+        df[CHECKPOINTS].to_numpy(),
+        [VIEW_METERS[checkpoint] for checkpoint in CHECKPOINTS],
+        CHECKPOINTS,
+        baseline=BASELINE,
+    )
+    df_speed = features.to_frame(features.speed('mps'), df[['name', 'bib']])
 
-# Create percent change dataframe
-df_percent = df_speed.copy()
-base_speed = df_speed['5K']  # Using 5K as the reference point
+    #create a boxplot for the segment speed data
+    plt.figure(figsize=(12, 8))
+    df_speed.boxplot()
 
-# Calculate percent change relative to 5K (negative values indicate slower speeds)
-for checkpoint in checkpoints:
-    df_percent[checkpoint] = ((df_speed[checkpoint] - base_speed) / base_speed) * 100
+    directory = os.path.dirname(args.out)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    plt.savefig(args.out, bbox_inches='tight')
+    if args.show:
+        plt.show()
 
+    # MeterPerSec and KMH_percent_noHalf are no longer written out; read them
+    # with load_view('mps') / load_view('percent') from src.data.race_store
 
-#create a boxplot for the percent change data
-plt.figure(figsize=(12, 8))
-df_speed.boxplot()
 
-plt.show()
-
-
-# Save both dataframes to CSV files
-df_speed.to_csv("D:/BAAFootwear/data/Raw/MeterPerSec.csv", index=False)
-df_percent.to_csv("D:/BAAFootwear/data/Raw/KMH_percent_noHalf.csv", index=False)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import hashlib
+import logging
+import os
+from functools import lru_cache
+
+from PIL import Image
+
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), 'static')
+THUMB_DIR = os.path.join(STATIC_DIR, 'thumbs')
+# Longest side in pixels; the picker page shows shoes at up to 400px
+THUMB_SIZE = 400
+
+
+def build_thumbnails(source: str = STATIC_DIR, target: str = THUMB_DIR, size: int = THUMB_SIZE,
+                     force: bool = False) -> int:
+    """Write a resized JPEG to ``target`` for every image in ``source``.
+
+    Thumbnails newer than their source are left alone unless ``force``.
+    Returns the number of thumbnails written.
+    """
+    os.makedirs(target, exist_ok=True)
+    written = 0
+    for filename in sorted(os.listdir(source)):
+        path = os.path.join(source, filename)
+        if not filename.lower().endswith(('.jpg', '.jpeg', '.png')) or not os.path.isfile(path):
+            continue
+        out = os.path.join(target, os.path.splitext(filename)[0] + '.jpg')
+        if not force and os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(path):
+            continue
+        with Image.open(path) as image:
+            image = image.convert('RGB')
+            image.thumbnail((size, size), Image.LANCZOS)
+            image.save(out, 'JPEG', quality=85, optimize=True, progressive=True)
+        logger.info(f"{filename}: {os.path.getsize(path) // 1024} KB -> {os.path.getsize(out) // 1024} KB")
+        written += 1
+    return written
+
+
+@lru_cache(maxsize=None)
+def asset_version(path: str) -> str:
+    """Short content hash of a static file, used to version its URL."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the shoe picker thumbnails from src/data/static.')
+    parser.add_argument('--size', type=int, default=THUMB_SIZE)
+    parser.add_argument('--force', action='store_true', help='Rebuild thumbnails that look up to date')
+    args = parser.parse_args()
+    written = build_thumbnails(size=args.size, force=args.force)
+    logger.info(f"Wrote {written} thumbnails to {THUMB_DIR}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+DONE = 'done'
+INVALID = 'invalid'
+FAILED = 'failed'
+
+
+class CrawlLedger:
+    """Persistent record of which idp values a sweep has already handled.
+
+    Every idp ends up ``done`` (runner saved), ``invalid`` (page exists but
+    has no usable splits) or ``failed`` (fetch or parse error). A restarted
+    sweep only revisits unseen and failed ids.
+    """
+
+    def __init__(self, path: str, commit_every: int = 200):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS crawl (
+                idp TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def pending(self, idps: Iterable[str]) -> List[str]:
+        """Return the idps that are not yet done or known to be invalid."""
+        finished = {row[0] for row in self._conn.execute(
+            'SELECT idp FROM crawl WHERE status IN (?, ?)', (DONE, INVALID))}
+        return [idp for idp in idps if idp not in finished]
+
+    def mark(self, idp: str, status: str, error: Optional[str] = None) -> None:
+        """Record the outcome of one idp."""
+        self._conn.execute('''
+            INSERT INTO crawl (idp, status, attempts, error, updated)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT(idp) DO UPDATE SET
+                status = excluded.status,
+                attempts = crawl.attempts + 1,
+                error = excluded.error,
+                updated = excluded.updated
+        ''', (idp, status, error, time.time()))
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def counts(self) -> Dict[str, int]:
+        """Number of idps per status."""
+        return dict(self._conn.execute('SELECT status, COUNT(*) FROM crawl GROUP BY status'))
+
+    def commit(self) -> None:
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._conn.close()
@@ -0,0 +1,165 @@
+import asyncio
+import concurrent.futures
+import logging
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+import aiohttp
+
+from src.data.page_cache import PageCache
+
+
+logger = logging.getLogger(__name__)
+
+# Status codes that are worth another attempt after a pause: rate limiting
+# and server errors. Any other 4xx (other than 404) fails straight away.
+TOO_MANY_REQUESTS = 429
+
+
+def is_retryable(status: int) -> bool:
+    return status == TOO_MANY_REQUESTS or status >= 500
+
+
+@dataclass
+class FetchConfig:
+    """Tuning knobs for the async fetch engine."""
+    concurrency_per_host: int = 64
+    max_retries: int = 4
+    backoff_base: float = 0.5
+    backoff_cap: float = 30.0
+    timeout: float = 30.0
+    keepalive_timeout: float = 60.0
+    user_agent: str = 'BAAFootwear/0.1 (+https://github.com/jkuzmeski/BAAFootwear)'
+
+
+class FetchError(Exception):
+    """Raised when a URL still fails after every retry."""
+
+
+class AsyncFetcher:
+    """Pooled keep-alive HTTP client with per-host limits and retries.
+
+    Use as an async context manager so the connection pool is shared by every
+    request made through it and closed cleanly at the end of a sweep. The
+    connector's per-host limit caps the requests in flight to each host. With a
+    ``cache``, pages already on disk are served from it and every new
+    response is stored.
+    """
+
+    def __init__(self, config: Optional[FetchConfig] = None, cache: Optional[PageCache] = None):
+        self.config = config or FetchConfig()
+        self.cache = cache
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> 'AsyncFetcher':
+        connector = aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=self.config.concurrency_per_host,
+            keepalive_timeout=self.config.keepalive_timeout,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.config.timeout),
+            headers={
+                'Accept-Encoding': 'gzip, deflate',
+                'User-Agent': self.config.user_agent,
+            },
+            auto_decompress=True,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._session.close()
+        self._session = None
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given attempt number."""
+        ceiling = min(self.config.backoff_cap, self.config.backoff_base * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    async def fetch(self, url: str) -> Optional[str]:
+        """Return the body of ``url``, or None if the page does not exist."""
+        if self.cache is not None and url in self.cache:
+            return self.cache.get(url)
+        html = await self._fetch_remote(url)
+        if self.cache is not None:
+            self.cache.put(url, html)
+        return html
+
+    async def _fetch_remote(self, url: str) -> Optional[str]:
+        last_error = None
+        for attempt in range(self.config.max_retries + 1):
+            delay = self._backoff(attempt)
+            try:
+                async with self._session.get(url) as response:
+                    if response.status == 404:
+                        return None
+                    if response.status < 400:
+                        return await response.text(errors='replace')
+                    if not is_retryable(response.status):
+                        raise FetchError(f"{url} failed: HTTP {response.status}")
+                    last_error = f"HTTP {response.status}"
+                    retry_after = response.headers.get('Retry-After', '')
+                    if retry_after.isdigit():
+                        delay = max(delay, float(retry_after))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = f"{type(e).__name__}: {e}"
+
+            if attempt < self.config.max_retries:
+                logger.debug(f"Retrying {url} in {delay:.2f}s after {last_error}")
+                await asyncio.sleep(delay)
+
+        raise FetchError(f"{url} failed after {self.config.max_retries + 1} attempts: {last_error}")
+
+
+async def crawl(urls: Iterable[str],
+                parse: Callable[[str], Any],
+                on_result: Callable[[str, Any, Optional[Exception]], None],
+                config: Optional[FetchConfig] = None,
+                workers: Optional[int] = None,
+                executor: Optional[concurrent.futures.Executor] = None,
+                cache: Optional[PageCache] = None) -> None:
+    """Fetch every URL and hand the parsed page to ``on_result``.
+
+    Args:
+        urls: Detail-page URLs to fetch.
+        parse: Called with the page HTML; its return value is passed on.
+        on_result: Called as ``on_result(url, parsed, error)`` for every URL.
+                   ``parsed`` is None for missing pages or failures and
+                   ``error`` is set when the fetch or parse raised.
+        config: Fetch engine settings.
+        workers: Number of concurrent fetch tasks. Defaults to the per-host
+                 concurrency limit.
+        executor: Optional pool to run ``parse`` in so parsing does not stall
+                  the event loop. ``parse`` must be picklable for a process pool.
+        cache: Optional raw-page cache to read from and fill.
+    """
+    loop = asyncio.get_running_loop()
+    config = config or FetchConfig()
+    workers = workers or config.concurrency_per_host
+    queue: asyncio.Queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+
+    async def worker(fetcher: AsyncFetcher) -> None:
+        while True:
+            try:
+                url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                html = await fetcher.fetch(url)
+                if html is None:
+                    parsed = None
+                elif executor is not None:
+                    parsed = await loop.run_in_executor(executor, parse, html)
+                else:
+                    parsed = parse(html)
+            except Exception as e:
+                on_result(url, None, e)
+            else:
+                on_result(url, parsed, None)
+
+    async with AsyncFetcher(config, cache) as fetcher:
+        await asyncio.gather(*(worker(fetcher) for _ in range(workers)))
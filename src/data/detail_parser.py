@@ -0,0 +1,119 @@
+import html
+import re
+from dataclasses import dataclass
+from itertools import islice
+from typing import List, Optional
+
+
+# Position of the participant and split tables among the page's <table>s
+NAME_TABLE = 0
+SPLIT_TABLE = 3
+NAME_ROW = 0
+BIB_ROW = 2
+
+# Mile markers between the kilometre splits that the analysis does not use
+SKIPPED_SPLIT_ROWS = {7, 8, 10, 11, 13}
+MIN_SPLIT_ROWS = 14
+MIN_SPLIT_COLUMNS = 6
+
+# Columns of the split table: Split, Time Of Day, Time, Diff, min/mile, miles/h
+LABEL_COLUMN = 0
+TIME_COLUMN = 2
+MIN_MILE_COLUMN = 4
+MPH_COLUMN = 5
+
+_TABLE_RE = re.compile(r'<table\b.*?</table\s*>', re.I | re.S)
+_THEAD_RE = re.compile(r'<thead\b.*?</thead\s*>', re.I | re.S)
+_ROW_RE = re.compile(r'<tr\b[^>]*>(.*?)</tr\s*>', re.I | re.S)
+_CELL_RE = re.compile(r'<(t[hd])\b[^>]*>(.*?)</t[hd]\s*>', re.I | re.S)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+@dataclass
+class Split:
+    label: str
+    time: Optional[str]
+    min_mile: Optional[str]
+    mph: Optional[float]
+
+
+@dataclass
+class RunnerRecord:
+    name: str
+    bib: str
+    splits: List[Split]
+
+
+def _cell_text(raw: str) -> Optional[str]:
+    """Visible text of a cell, None when the cell is empty."""
+    text = ' '.join(html.unescape(_TAG_RE.sub('', raw)).split())
+    return text or None
+
+
+def _table_rows(table_html: str) -> List[List[Optional[str]]]:
+    """Body rows of a table as lists of cell text."""
+    body = _THEAD_RE.sub('', table_html)
+    rows = [_CELL_RE.findall(row) for row in _ROW_RE.findall(body)]
+    # Without a <thead>, leading rows made only of <th> cells are the header
+    if len(body) == len(table_html):
+        while rows and rows[0] and all(tag.lower() == 'th' for tag, _ in rows[0]):
+            rows.pop(0)
+    return [[_cell_text(cell) for _, cell in row] for row in rows]
+
+
+def _column_count(table_html: str) -> int:
+    return max((len(_CELL_RE.findall(row)) for row in _ROW_RE.findall(table_html)), default=0)
+
+
+def _to_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_detail_page(page: str) -> Optional[RunnerRecord]:
+    """Extract name, bib and kilometre splits from a results.baa.org detail page.
+
+    Returns None for pages the sweep should skip: missing tables, '-' in the
+    name or any split cell, fewer than 14 split rows, '*' among the first 14
+    split labels, or fewer than six split columns.
+    """
+    tables = list(islice(_TABLE_RE.finditer(page), SPLIT_TABLE + 1))
+    if len(tables) <= SPLIT_TABLE:
+        return None
+
+    participant = _table_rows(tables[NAME_TABLE].group())
+    if len(participant) <= BIB_ROW:
+        return None
+    name = participant[NAME_ROW][1] if len(participant[NAME_ROW]) > 1 else None
+    bib = participant[BIB_ROW][1] if len(participant[BIB_ROW]) > 1 else None
+    if name == '-':
+        return None
+
+    split_html = tables[SPLIT_TABLE].group()
+    rows = _table_rows(split_html)
+    if any('-' in row for row in rows):
+        return None
+
+    leading_labels = [row[LABEL_COLUMN] if row else None for row in rows[:MIN_SPLIT_ROWS]]
+    real_rows = [label for label in leading_labels if label is None or '*' not in label]
+    if len(rows) < MIN_SPLIT_ROWS or len(real_rows) < MIN_SPLIT_ROWS:
+        return None
+    if _column_count(split_html) < MIN_SPLIT_COLUMNS:
+        return None
+
+    def cell(row: List[Optional[str]], column: int) -> Optional[str]:
+        return row[column] if column < len(row) else None
+
+    splits = [
+        Split(
+            label=cell(row, LABEL_COLUMN),
+            time=cell(row, TIME_COLUMN),
+            min_mile=cell(row, MIN_MILE_COLUMN),
+            mph=_to_float(cell(row, MPH_COLUMN)),
+        )
+        for position, row in enumerate(rows)
+        if position not in SKIPPED_SPLIT_ROWS
+    ]
+    return RunnerRecord(name=name, bib=bib, splits=splits)
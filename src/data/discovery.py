@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from src.data.crawler import AsyncFetcher, FetchConfig
+from src.data.editions import RACE_YEAR
+
+
+logger = logging.getLogger(__name__)
+
+# Paginated finisher list; num_results is capped by the site at 100
+LIST_URL = 'https://results.baa.org/{year}/?pid=list&event=R&num_results=100&page={page}'
+
+_IDP_RE = re.compile(r'[?&](?:amp;)?idp=([0-9A-Za-z]+)')
+_PAGE_RE = re.compile(r'[?&](?:amp;)?page=(\d+)')
+
+
+def parse_listing_page(html: str) -> Tuple[List[str], int]:
+    """Return the idps linked from a listing page and the highest page number it links to."""
+    idps = list(dict.fromkeys(_IDP_RE.findall(html)))
+    last_page = max((int(page) for page in _PAGE_RE.findall(html)), default=1)
+    return idps, last_page
+
+
+async def discover_idps(year: int = RACE_YEAR,
+                        config: Optional[FetchConfig] = None,
+                        max_pages: int = 2000,
+                        list_url: str = LIST_URL) -> List[str]:
+    """Walk one edition's results listing and collect every runner's idp.
+
+    The first page tells us how far the pagination goes; the pages up to
+    that point are fetched concurrently, and any page that links further
+    extends the walk until no new pages turn up. A page that cannot be
+    fetched is logged and skipped, so its runners are missing from the
+    result but the rest of the listing is still collected.
+    """
+    pages: Dict[int, List[str]] = {}
+    failed: List[int] = []
+    last_page = 1
+
+    async with AsyncFetcher(config) as fetcher:
+        async def fetch_page(page: int) -> Tuple[int, Optional[List[str]], int]:
+            try:
+                html = await fetcher.fetch(list_url.format(year=year, page=page))
+            except Exception as e:
+                logger.warning(f"{year}: listing page {page} failed: {e}")
+                return page, None, page
+            if html is None:
+                return page, [], page
+            idps, linked = parse_listing_page(html)
+            return page, idps, linked
+
+        while True:
+            todo = [page for page in range(1, min(last_page, max_pages) + 1) if page not in pages]
+            if not todo:
+                break
+            for page, idps, linked in await asyncio.gather(*(fetch_page(page) for page in todo)):
+                if idps is None:
+                    failed.append(page)
+                    idps = []
+                pages[page] = idps
+                # An empty page means we have walked past the end of the list
+                if idps:
+                    last_page = max(last_page, linked)
+            logger.info(f"{year}: listing pages 1-{max(pages)} read, {sum(map(len, pages.values()))} runners found")
+
+    if failed:
+        logger.warning(f"{year}: {len(failed)} listing pages could not be read, "
+                       f"their runners are missing: {sorted(failed)}")
+
+    # Keep listing order and drop runners that appear on two pages
+    return list(dict.fromkeys(idp for page in sorted(pages) for idp in pages[page]))
@@ -0,0 +1,26 @@
+import os
+from typing import Dict, Iterable, List
+
+
+# Edition crawled and labelled when no year is given; the shoe labels are from this race
+RACE_YEAR = 2024
+# Every edition's results live under their own year on results.baa.org
+RESULTS_URL = 'https://results.baa.org/{year}/'
+# Shared prefix of each edition's idps, only needed when enumerating ids by brute force
+IDP_PREFIXES: Dict[int, str] = {
+    2024: '9TGHS6FF19',
+}
+
+
+def year_dir(root: str, year: int) -> str:
+    """Per-edition subdirectory of ``root``, e.g. data/Raw/2024."""
+    return os.path.join(root, str(year))
+
+
+def parse_years(values: Iterable[str]) -> List[int]:
+    """Years from the command line, allowing ranges like 2022-2024."""
+    years = []
+    for value in values:
+        first, _, last = str(value).partition('-')
+        years.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(years))
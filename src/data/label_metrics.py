@@ -0,0 +1,115 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = os.path.join('data', 'interim', 'label_metrics.jsonl')
+
+# Stages recorded by the labeling tool
+PHOTO_WAIT = 'photo_wait'          # loop waiting for the next prefetched photo page
+PHOTO_LOAD = 'photo_load'          # opening a runner's gallery (direct URL or results search)
+SELECTION_PAGE = 'selection_page'  # loading the shoe picker
+DECISION = 'decision'              # picker shown until a shoe is submitted
+SUBMIT = 'submit'                  # writing the label
+TAB_CLEANUP = 'tab_cleanup'        # closing the photo tabs afterwards
+STAGES = [PHOTO_WAIT, PHOTO_LOAD, SELECTION_PAGE, DECISION, SUBMIT, TAB_CLEANUP]
+
+PERCENTILES = [0.5, 0.9, 0.99]
+
+
+class MetricsLog:
+    """Append-only JSON-lines log of how long each labeling stage took.
+
+    Every line holds the session, bib, stage, wall-clock time the stage
+    ended and its duration in seconds, plus any extra fields. Lines are
+    flushed as they are written, so an interrupted session keeps its data.
+    """
+
+    def __init__(self, path: str = METRICS_PATH, session: Optional[str] = None):
+        self.path = path
+        self.session = session or uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._file = None
+
+    def record(self, bib, stage: str, seconds: float, **extra) -> None:
+        entry = {'session': self.session, 'bib': str(bib), 'stage': stage,
+                 'time': time.time(), 'seconds': round(seconds, 4), **extra}
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+
+    @contextmanager
+    def timed(self, bib, stage: str, **extra) -> Iterator[dict]:
+        """Time the block and record it; fields added to the yielded dict are logged too."""
+        start = time.perf_counter()
+        yield extra
+        self.record(bib, stage, time.perf_counter() - start, **extra)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def summarize(path: str = METRICS_PATH) -> pd.DataFrame:
+    """Count, mean and percentiles of the duration of every stage, in seconds."""
+    metrics = pd.read_json(path, lines=True)
+    stats = metrics.groupby('stage')['seconds'].describe(percentiles=PERCENTILES)
+    order = [stage for stage in STAGES if stage in stats.index]
+    return stats.reindex(order + [s for s in stats.index if s not in order])
+
+
+def labels_per_hour(path: str = METRICS_PATH) -> pd.DataFrame:
+    """Labels, active hours and labels per hour of every session (and labeler, in server mode).
+
+    A session's hours run from its first to its last recorded stage.
+    """
+    metrics = pd.read_json(path, lines=True)
+    if 'labeler' not in metrics.columns:
+        metrics['labeler'] = ''
+    keys = ['session', metrics['labeler'].fillna('')]
+    spans = metrics.groupby(keys)['time'].agg(['min', 'max'])
+    labels = metrics[metrics['stage'] == DECISION].groupby(keys).size()
+    sessions = pd.DataFrame({
+        'labels': labels.reindex(spans.index, fill_value=0),
+        'hours': (spans['max'] - spans['min']) / 3600,
+    })
+    sessions['labels_per_hour'] = sessions['labels'] / sessions['hours'].where(sessions['hours'] > 0)
+    return sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarise labeling stage timings.')
+    parser.add_argument('path', nargs='?', default=METRICS_PATH)
+    args = parser.parse_args()
+
+    pd.set_option('display.width', 120)
+    logger.info(f"Stage durations (seconds):\n{summarize(args.path).round(3)}")
+    sessions = labels_per_hour(args.path)
+    logger.info(f"Sessions:\n{sessions.round(2)}")
+    total_hours = sessions['hours'].sum()
+    if total_hours > 0:
+        logger.info(f"Overall: {sessions['labels'].sum()} labels in {total_hours:.2f} labeler-hours, "
+                    f"{sessions['labels'].sum() / total_hours:.1f} labels per hour")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main()
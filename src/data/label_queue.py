@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.data.label_store import LabelStore
+
+
+logger = logging.getLogger(__name__)
+
+# How long a labeler may hold a runner before it goes back in the queue
+LEASE_SECONDS = 600
+
+
+@dataclass
+class Lease:
+    bib: str
+    name: str
+    labeler: str
+    expires: float
+    leased: float
+
+
+class LeaseQueue:
+    """Hand unlabeled runners out to several labelers without overlap.
+
+    Each labeler leases one runner at a time. A lease that is not completed
+    within ``lease_seconds`` (closed tab, lunch break) expires and the runner
+    goes to the front of the queue for the next labeler who asks. Runners
+    already in the label store are skipped, so a restarted server picks up
+    where it left off.
+    """
+
+    def __init__(self, runners: Iterable[Tuple[str, str]], store: LabelStore,
+                 lease_seconds: float = LEASE_SECONDS):
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._pending = deque((str(bib), name) for bib, name in runners if bib not in store)
+        self._leases: Dict[str, Lease] = {}
+
+    def _reclaim_expired(self, now: float) -> None:
+        expired = [lease for lease in self._leases.values() if lease.expires <= now]
+        for lease in expired:
+            logger.info(f"Lease on bib {lease.bib} held by {lease.labeler} expired, requeueing")
+            del self._leases[lease.bib]
+        # Back to the front of the queue in the order they were first handed out
+        self._pending.extendleft((lease.bib, lease.name) for lease in reversed(expired))
+
+    def lease(self, labeler: str) -> Optional[Lease]:
+        """Next runner for ``labeler``, or None when everyone is labeled or leased.
+
+        A labeler who asks again before finishing gets the same runner back
+        with a fresh timeout.
+        """
+        leases = self.lease_batch(labeler, 1)
+        return leases[0] if leases else None
+
+    def lease_batch(self, labeler: str, size: int) -> List[Lease]:
+        """Up to ``size`` runners for ``labeler``, starting with any it already holds."""
+        with self._lock:
+            now = time.time()
+            self._reclaim_expired(now)
+            leases = [lease for lease in self._leases.values() if lease.labeler == labeler][:size]
+            for lease in leases:
+                lease.expires = now + self.lease_seconds
+            while len(leases) < size and self._pending:
+                bib, name = self._pending.popleft()
+                if bib in self.store:
+                    continue
+                lease = Lease(bib, name, labeler, now + self.lease_seconds, now)
+                self._leases[bib] = lease
+                leases.append(lease)
+            return leases
+
+    def complete(self, bib: str, labeler: str, name: str, shoe: str) -> Optional[Lease]:
+        """Save a label and release its lease, which is returned if there was one.
+
+        A label is kept even when the lease had already expired, and any lease
+        another labeler has taken on the same runner since is dropped.
+        """
+        leases = self.complete_batch([(bib, name, shoe)], labeler)
+        return leases[0]
+
+    def complete_batch(self, labels: List[Tuple[str, str, str]], labeler: str) -> List[Optional[Lease]]:
+        """Save several ``(bib, name, shoe)`` labels in one transaction; see ``complete``."""
+        labels = [(str(bib), name, shoe) for bib, name, shoe in labels]
+        with self._lock:
+            leases = [self._leases.pop(bib, None) for bib, _, _ in labels]
+            for (bib, _, _), lease in zip(labels, leases):
+                if lease is not None and lease.labeler != labeler:
+                    logger.info(f"Bib {bib} labeled by {labeler} while leased to {lease.labeler}")
+            self.store.save_many(labels)
+            return leases
+
+    def release(self, bibs: Iterable[str], labeler: str) -> None:
+        """Give runners ``labeler`` skipped back to the front of the queue, in order."""
+        with self._lock:
+            released = [self._leases[bib] for bib in map(str, bibs)
+                        if bib in self._leases and self._leases[bib].labeler == labeler]
+            for lease in released:
+                del self._leases[lease.bib]
+            self._pending.extendleft((lease.bib, lease.name) for lease in reversed(released))
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'labeled': len(self.store),
+                'leased': len(self._leases),
+                'pending': len(self._pending),
+            }
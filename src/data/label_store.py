@@ -0,0 +1,228 @@
+import argparse
+import csv
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from src.data.editions import RACE_YEAR
+
+logger = logging.getLogger(__name__)
+
+LABELS_PATH = os.path.join('data', 'interim', 'shoe_labels.sqlite')
+# Headerless bib,name,shoe,year file that is committed and shared between labelers
+SHOE_CHOICES_CSV = os.path.join('data', 'Raw', 'ShoeChoices.csv')
+# Rows written before the year column was added are all labels of this edition
+UNDATED_YEAR = 2024
+
+CREATE_LABELS = '''
+    CREATE TABLE IF NOT EXISTS labels (
+        year INTEGER NOT NULL,
+        bib TEXT NOT NULL,
+        name TEXT,
+        shoe TEXT NOT NULL,
+        labeled REAL NOT NULL,
+        PRIMARY KEY (year, bib)
+    )
+'''
+
+
+class LabelStore:
+    """Shoe labels keyed by year and bib in a SQLite database in WAL mode.
+
+    Bibs are reused every year, so each label belongs to one edition. A store
+    labels the runners of ``year``: ``save`` writes that year, and ``in`` and
+    ``processed`` only look at it. Saving a bib again replaces its label;
+    merging a CSV only adds labels the store does not have yet. The set of
+    labeled bibs is kept in memory and updated on every write, so checking
+    whether a runner is done never touches the disk. One store can be shared
+    between the labeling loop and the Flask threads.
+    """
+
+    def __init__(self, path: str = LABELS_PATH, year: int = RACE_YEAR):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.year = int(year)
+        self._lock = threading.Lock()
+        # Transactions are opened by hand with BEGIN IMMEDIATE so a writer in
+        # another process waits for the lock instead of failing mid-upgrade
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(CREATE_LABELS)
+        self._add_year_column()
+        self._processed: Set[str] = {
+            row[0] for row in self._conn.execute('SELECT bib FROM labels WHERE year = ?', (self.year,))
+        }
+
+    def _add_year_column(self) -> None:
+        """Move a store from before labels had a year to the (year, bib) key."""
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(labels)')]
+        if 'year' in columns:
+            return
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.execute('ALTER TABLE labels RENAME TO labels_undated')
+            self._conn.execute(CREATE_LABELS)
+            self._conn.execute('''
+                INSERT INTO labels (year, bib, name, shoe, labeled)
+                SELECT ?, bib, name, shoe, labeled FROM labels_undated ORDER BY rowid
+            ''', (UNDATED_YEAR,))
+            self._conn.execute('DROP TABLE labels_undated')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+        logger.info(f"Labels in {self.path} assigned to {UNDATED_YEAR}")
+
+    def __contains__(self, bib) -> bool:
+        return str(bib) in self._processed
+
+    def __len__(self) -> int:
+        return len(self._processed)
+
+    @property
+    def processed(self) -> Set[str]:
+        """Bibs of the store's year that already have a label."""
+        return self._processed
+
+    def save(self, bib, name: str, shoe: str) -> None:
+        """Store (or replace) the label for one runner of the store's year."""
+        self.save_many([(bib, name, shoe)])
+
+    def save_many(self, labels: Iterable[Tuple[str, str, str]]) -> None:
+        """Store several ``(bib, name, shoe)`` labels of the store's year in a single transaction."""
+        self._write([(self.year, bib, name, shoe) for bib, name, shoe in labels], '''
+            INSERT INTO labels (year, bib, name, shoe, labeled) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(year, bib) DO UPDATE SET
+                name = excluded.name,
+                shoe = excluded.shoe,
+                labeled = excluded.labeled
+        ''')
+
+    def merge_many(self, labels: Iterable[Tuple[int, str, str, str]]) -> int:
+        """Add ``(year, bib, name, shoe)`` labels not in the store yet; returns how many were added."""
+        return self._write(labels, '''
+            INSERT OR IGNORE INTO labels (year, bib, name, shoe, labeled) VALUES (?, ?, ?, ?, ?)
+        ''')
+
+    def _write(self, labels: Iterable[Tuple[int, str, str, str]], sql: str) -> int:
+        now = time.time()
+        rows = [(int(year), str(bib), name, shoe, now) for year, bib, name, shoe in labels]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(sql, rows)
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            self._processed.update(row[1] for row in rows if row[0] == self.year)
+            return self._conn.total_changes - before
+
+    def import_csv(self, path: str = SHOE_CHOICES_CSV, replace: bool = False) -> int:
+        """Load a headerless bib,name,shoe,year file; returns the number of labels added or replaced.
+
+        Rows without a year are ``UNDATED_YEAR`` labels. By default only
+        labels the store does not have are added, so labels pulled in from
+        teammates are merged without touching local ones. With ``replace``
+        the file's labels win.
+        """
+        with open(path, newline='', encoding='latin1') as f:
+            rows = [(int(row[3]) if len(row) == 4 else UNDATED_YEAR, row[0], row[1], row[2])
+                    for row in csv.reader(f) if len(row) in (3, 4)]
+        if replace:
+            self._write(rows, '''
+                INSERT OR REPLACE INTO labels (year, bib, name, shoe, labeled) VALUES (?, ?, ?, ?, ?)
+            ''')
+            changed = len(rows)
+        else:
+            changed = self.merge_many(rows)
+        logger.info(f"Imported {changed} of {len(rows)} labels from {path}")
+        return changed
+
+    def export_csv(self, path: str = SHOE_CHOICES_CSV) -> int:
+        """Write every year's labels as a headerless bib,name,shoe,year file in labeling order.
+
+        Rows already in the file that the store lacks (e.g. pulled from a
+        teammate during the session) are merged first, so none are dropped.
+        """
+        if os.path.exists(path):
+            self.import_csv(path)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT bib, name, shoe, year FROM labels ORDER BY labeled, rowid').fetchall()
+        with open(path, 'w', newline='', encoding='latin1') as f:
+            csv.writer(f, lineterminator='\n').writerows(rows)
+        logger.info(f"Exported {len(rows)} labels to {path}")
+        return len(rows)
+
+    def to_frame(self, years: Optional[Iterable[int]] = None) -> pd.DataFrame:
+        """Labels with the column names the analysis code uses: year, bib, LastName, shoeChoice.
+
+        ``years`` picks the editions; all of them when None.
+        """
+        query = 'SELECT year, bib, name, shoe FROM labels'
+        params: List[int] = []
+        if years is not None:
+            params = [int(year) for year in years]
+            query += f" WHERE year IN ({', '.join('?' * len(params))})"
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY labeled, rowid', params).fetchall()
+        return pd.DataFrame(rows, columns=['year', 'bib', 'LastName', 'shoeChoice'])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_label_store(path: str = LABELS_PATH, seed: Optional[str] = SHOE_CHOICES_CSV,
+                     year: int = RACE_YEAR) -> LabelStore:
+    """Open the store for labeling ``year`` and merge in any labels from the shared CSV it does not have yet."""
+    store = LabelStore(path, year)
+    if seed and os.path.exists(seed):
+        store.import_csv(seed)
+    return store
+
+
+def load_labels(path: str = LABELS_PATH, seed: Optional[str] = SHOE_CHOICES_CSV,
+                years: Optional[Iterable[int]] = None) -> pd.DataFrame:
+    """Shoe labels as a DataFrame with year, bib, LastName and shoeChoice columns.
+
+    ``years`` picks the editions; all of them when None. Join to the race
+    store on year and bib, since bibs are reused every year.
+    """
+    store = open_label_store(path, seed)
+    try:
+        return store.to_frame(years)
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move shoe labels between the label store and ShoeChoices.csv.')
+    parser.add_argument('action', choices=['import', 'export'])
+    parser.add_argument('csv', nargs='?', default=SHOE_CHOICES_CSV)
+    parser.add_argument('--store', default=LABELS_PATH)
+    args = parser.parse_args()
+
+    store = LabelStore(args.store)
+    try:
+        if args.action == 'import':
+            store.import_csv(args.csv, replace=True)
+        else:
+            store.export_csv(args.csv)
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
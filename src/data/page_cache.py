@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Iterator, Optional, Tuple
+
+
+CACHE_DIR = os.path.join('data', 'external', 'page_cache')
+
+# Marks a URL whose fetch came back 404, so replays skip it without a request
+MISSING = ''
+
+
+class PageCache:
+    """Compressed, content-addressed store of raw page HTML.
+
+    Page bodies are gzipped under ``objects/`` and named by the SHA-256 of
+    their content, so identical pages are stored once. A sqlite index maps
+    each URL to the digest of the body it returned.
+    """
+
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+        self.objects = os.path.join(root, 'objects')
+        os.makedirs(self.objects, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, 'index.sqlite'))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                fetched REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects, digest[:2], f'{digest[2:]}.html.gz')
+
+    def _read(self, digest: str) -> Optional[str]:
+        if digest == MISSING:
+            return None
+        with gzip.open(self._object_path(digest), 'rt', encoding='utf-8') as f:
+            return f.read()
+
+    def __contains__(self, url: str) -> bool:
+        return self._conn.execute('SELECT 1 FROM pages WHERE url = ?', (url,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def get(self, url: str) -> Optional[str]:
+        """Cached body of ``url``; None if it was a 404. Raises KeyError if never fetched."""
+        row = self._conn.execute('SELECT digest FROM pages WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            raise KeyError(url)
+        return self._read(row[0])
+
+    def put(self, url: str, html: Optional[str]) -> str:
+        """Store the body fetched for ``url`` (None for a 404) and return its digest."""
+        if html is None:
+            digest = MISSING
+        else:
+            body = html.encode('utf-8')
+            digest = hashlib.sha256(body).hexdigest()
+            path = self._object_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write then rename so an interrupted write never leaves a truncated object
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with gzip.open(tmp_path, 'wb') as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+        self._conn.execute('INSERT OR REPLACE INTO pages (url, digest, fetched) VALUES (?, ?, ?)',
+                           (url, digest, time.time()))
+        self._conn.commit()
+        return digest
+
+    def items(self) -> Iterator[Tuple[str, Optional[str]]]:
+        """Every cached (url, html) pair, in the order they were fetched."""
+        rows = self._conn.execute('SELECT url, digest FROM pages ORDER BY fetched').fetchall()
+        for url, digest in rows:
+            yield url, self._read(digest)
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,99 @@
+import logging
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PreparedRunner:
+    """A runner whose photo page is already open in its own browser session."""
+    bib: str
+    name: str
+    driver: Any
+    original_window: str
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def release(self) -> None:
+        """Hand the browser session back so it can load the next runner."""
+        self._done.set()
+
+
+class PhotoPrefetcher:
+    """Keep the next few runners' photo pages loading in background sessions.
+
+    Each of ``size`` worker threads owns one WebDriver. A worker takes the
+    next runner, runs ``load_photos(driver, bib, name)`` (which returns the
+    window handle to go back to), minimises the window and waits until the
+    labeler has released it. Iterating over the prefetcher yields runners
+    as soon as their pages are ready.
+    """
+
+    def __init__(self, runners: Iterable[Tuple[str, str]],
+                 load_photos: Callable[[Any, str, str], str],
+                 create_driver: Callable[[], Any],
+                 size: int = 3):
+        self._todo: queue.Queue = queue.Queue()
+        for bib, name in runners:
+            self._todo.put((bib, name))
+        self._ready: queue.Queue = queue.Queue()
+        self._load_photos = load_photos
+        self._stopping = threading.Event()
+        self._workers = [
+            threading.Thread(target=self._work, args=(create_driver,), daemon=True)
+            for _ in range(size)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _work(self, create_driver: Callable[[], Any]) -> None:
+        driver = None
+        try:
+            driver = create_driver()
+            while not self._stopping.is_set():
+                try:
+                    bib, name = self._todo.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    original_window = self._load_photos(driver, bib, name)
+                except Exception as e:
+                    logger.warning(f"Could not load photos for bib {bib} ({name}): {e}")
+                    continue
+                # Keep the page loaded but out of the way until it is this runner's turn
+                driver.minimize_window()
+                runner = PreparedRunner(bib, name, driver, original_window)
+                self._ready.put(runner)
+                runner._done.wait()
+        except Exception as e:
+            logger.warning(f"Photo worker stopped: {e}")
+        finally:
+            # The end marker must be posted even if the browser never started
+            # or fails to quit, or iterating would wait on this worker forever
+            try:
+                if driver is not None:
+                    driver.quit()
+            except Exception as e:
+                logger.warning(f"Could not close the browser session: {e}")
+            finally:
+                self._ready.put(None)
+
+    def __iter__(self) -> Iterator[PreparedRunner]:
+        finished = 0
+        while finished < len(self._workers):
+            runner = self._ready.get()
+            if runner is None:
+                finished += 1
+            else:
+                yield runner
+
+    def close(self) -> None:
+        """Stop handing out runners and shut the browser sessions down."""
+        self._stopping.set()
+        while not self._ready.empty():
+            runner = self._ready.get_nowait()
+            if runner is not None:
+                runner.release()
@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import html
+import logging
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, Iterable, Optional
+
+from src.data.crawler import AsyncFetcher, FetchConfig
+from src.data.discovery import parse_listing_page
+from src.data.editions import RACE_YEAR
+
+
+logger = logging.getLogger(__name__)
+
+SEARCH_URL = 'https://results.baa.org/{year}/?pid=search&event=R&search%5Bstart_no%5D={bib}'
+DETAIL_URL = 'https://results.baa.org/{year}/?content=detail&fpid=search&pid=search&idp={idp}'
+RESOLVER_PATH = os.path.join('data', 'interim', 'photo_urls.sqlite')
+
+_PHOTO_LINK_RE = re.compile(r'<a\b[^>]*?href="([^"]+)"[^>]*>(?:(?!</a>).)*?marathonfoto(?:(?!</a>).)*?</a>',
+                            re.I | re.S)
+
+
+def parse_photo_link(page: str) -> Optional[str]:
+    """The Marathonfoto gallery link on a results detail page, if there is one."""
+    match = _PHOTO_LINK_RE.search(page)
+    return html.unescape(match.group(1)) if match else None
+
+
+class PhotoUrlCache:
+    """Persistent bib -> Marathonfoto gallery URL map.
+
+    A bib stored with no URL has been looked up and has no gallery link, so
+    it is not searched again.
+    """
+
+    def __init__(self, path: str = RESOLVER_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS photo_urls (
+                bib TEXT PRIMARY KEY,
+                url TEXT,
+                resolved REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+        self._urls: Dict[str, Optional[str]] = dict(self._conn.execute('SELECT bib, url FROM photo_urls'))
+
+    def __contains__(self, bib: str) -> bool:
+        return str(bib) in self._urls
+
+    def get(self, bib: str) -> Optional[str]:
+        return self._urls.get(str(bib))
+
+    def put(self, bib: str, url: Optional[str]) -> None:
+        bib = str(bib)
+        self._conn.execute('INSERT OR REPLACE INTO photo_urls (bib, url, resolved) VALUES (?, ?, ?)',
+                           (bib, url, time.time()))
+        self._conn.commit()
+        self._urls[bib] = url
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+async def resolve_photo_urls(bibs: Iterable[str], cache: PhotoUrlCache,
+                             config: Optional[FetchConfig] = None,
+                             year: int = RACE_YEAR) -> Dict[str, Optional[str]]:
+    """Look up the gallery URL of every bib of the ``year`` edition not already in ``cache`` over plain HTTP.
+
+    Each bib takes two requests: the results search for the bib, then the
+    detail page it links to.
+    """
+    todo = [str(bib) for bib in bibs if bib not in cache]
+    resolved = 0
+
+    async with AsyncFetcher(config or FetchConfig(concurrency_per_host=16)) as fetcher:
+        async def resolve(bib: str) -> None:
+            nonlocal resolved
+            try:
+                listing = await fetcher.fetch(SEARCH_URL.format(year=year, bib=bib))
+                idps, _ = parse_listing_page(listing or '')
+                detail = await fetcher.fetch(DETAIL_URL.format(year=year, idp=idps[0])) if idps else None
+            except Exception as e:
+                # Leave the bib out of the cache so the next run tries again
+                logger.warning(f"Could not resolve bib {bib}: {e}")
+                return
+            cache.put(bib, parse_photo_link(detail) if detail else None)
+            resolved += 1
+
+        await asyncio.gather(*(resolve(bib) for bib in todo))
+
+    logger.info(f"Resolved {resolved} of {len(todo)} bibs")
+    return {str(bib): cache.get(bib) for bib in bibs}
+
+
+def main():
+    from src.data.race_store import load_seconds
+
+    parser = argparse.ArgumentParser(description='Fill the bib -> Marathonfoto URL cache.')
+    parser.add_argument('--under', type=int, default=10800, help='Only runners with a finish under this many seconds')
+    args = parser.parse_args()
+
+    runners = load_seconds(columns=['bib', 'Finish Net'], years=[RACE_YEAR])
+    bibs = runners.loc[(runners['Finish Net'] > 0) & (runners['Finish Net'] < args.under), 'bib']
+    cache = PhotoUrlCache()
+    try:
+        asyncio.run(resolve_photo_urls(bibs, cache))
+    finally:
+        cache.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,151 @@
+import argparse
+import logging
+import os
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from src.data.editions import RACE_YEAR, parse_years, year_dir
+from src.data.split_times import SPLIT_COLUMNS, SPLIT_METERS
+from src.features.course import grade_adjusted_features
+from src.features.segment_speed import segment_features
+from src.features.split_quality import PROBLEMS, screen_splits
+
+
+logger = logging.getLogger(__name__)
+
+# Hive-partitioned Parquet dataset with one year=YYYY directory per edition
+STORE_PATH = os.path.join('data', 'processed', 'race_store')
+PROCESSED_DIR = os.path.join('data', 'processed')
+
+# Checkpoint distances for the speed views, shared with split_times
+VIEW_METERS = dict(zip(SPLIT_COLUMNS, SPLIT_METERS.tolist()))
+VIEWS = ['seconds', 'mps', 'kmh', 'mph', 'min_mile', 'percent', 'gap_mps', 'gap_percent']
+
+
+def seconds_csv(year: int = RACE_YEAR) -> str:
+    """RaceTimeSeconds CSV written by the crawl of one edition."""
+    return os.path.join(year_dir(PROCESSED_DIR, year), 'RaceTimeSeconds.csv')
+
+
+def build_store(source: Optional[str] = None, path: str = STORE_PATH,
+                year: int = RACE_YEAR) -> pd.DataFrame:
+    """Write one edition's partition of the typed Parquet store from its RaceTimeSeconds CSV.
+
+    Splits are screened on the way in: isolated gaps are interpolated and
+    every runner gets a ``quality`` bit mask (see src.features.split_quality).
+    Splits that are still missing are stored as -1. Only the ``year``
+    partition is replaced, so editions can be built independently.
+    """
+    source = source or seconds_csv(year)
+    data = pd.read_csv(source, encoding='latin1', dtype={'name': str, 'bib': str})
+    report = screen_splits(data[SPLIT_COLUMNS].to_numpy(), [VIEW_METERS[c] for c in SPLIT_COLUMNS],
+                           SPLIT_COLUMNS)
+    store = pd.DataFrame({
+        'name': data['name'].astype('category'),
+        'bib': data['bib'].astype(str),
+    })
+    seconds = np.nan_to_num(report.seconds, nan=-1).astype(np.int32)
+    for i, column in enumerate(SPLIT_COLUMNS):
+        store[column] = seconds[:, i]
+    store['quality'] = report.flags
+
+    partition = os.path.join(path, f'year={year}')
+    os.makedirs(partition, exist_ok=True)
+    # Write then rename so readers never see a half-written partition
+    tmp_path = os.path.join(partition, f'.part-0.parquet.{os.getpid()}.tmp')
+    store.to_parquet(tmp_path, index=False, compression='zstd')
+    os.replace(tmp_path, os.path.join(partition, 'part-0.parquet'))
+    logger.info(f"Wrote {len(store)} runners to {partition}, quality: {report.counts()}")
+    return store
+
+
+def store_years(path: str = STORE_PATH) -> List[int]:
+    """Editions that have a partition in the store."""
+    return sorted(int(name.split('=', 1)[1]) for name in os.listdir(path) if name.startswith('year='))
+
+
+def load_seconds(path: str = STORE_PATH, columns: Optional[List[str]] = None,
+                 usable_only: bool = False, years: Optional[Iterable[int]] = None) -> pd.DataFrame:
+    """Cumulative split seconds per runner: year, name, bib, one int32 column per checkpoint and quality.
+
+    The year and quality filters are pushed down to the Parquet scan, so
+    only the requested editions and columns are read. With ``usable_only``
+    runners with missing, non-monotonic or implausible splits are left out.
+    ``years`` picks the editions to read; all of them when None.
+    """
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    condition = None
+    if years is not None:
+        condition = ds.field('year').isin([int(year) for year in years])
+    if usable_only:
+        usable = pc.equal(pc.bit_wise_and(ds.field('quality'), PROBLEMS), 0)
+        condition = usable if condition is None else condition & usable
+    if columns is not None:
+        columns = list(columns)
+    else:
+        # Partition key first, then the file columns in stored order
+        columns = ['year'] + [name for name in dataset.schema.names if name != 'year']
+    data = dataset.to_table(columns=columns, filter=condition).to_pandas()
+    if 'name' in data.columns:
+        data['name'] = data['name'].astype(str)
+    return data
+
+
+def load_view(view: str = 'seconds', path: str = STORE_PATH, include_half: bool = False,
+              baseline: str = '5K', usable_only: bool = False,
+              years: Optional[Iterable[int]] = None) -> pd.DataFrame:
+    """Load the store and derive one of the per-segment views on the fly.
+
+    Views are ``seconds`` (cumulative), ``mps``, ``kmh`` and ``mph`` (segment
+    speed), ``min_mile`` (segment pace, minutes per mile) and ``percent``
+    (segment speed change relative to the ``baseline`` segment, in percent).
+    ``gap_mps`` and ``gap_percent`` are the same after adjusting each
+    segment's speed for the course's hills (see src.features.course).
+    ``usable_only`` drops runners flagged by the quality screen and ``years``
+    limits the editions read.
+    """
+    if view not in VIEWS:
+        raise ValueError(f"Unknown view '{view}', expected one of {VIEWS}")
+    checkpoints = [c for c in SPLIT_COLUMNS if include_half or c != 'HALF']
+    data = load_seconds(path, ['year', 'name', 'bib'] + checkpoints, usable_only, years)
+    runners = data[['year', 'name', 'bib']]
+    if view == 'seconds':
+        return pd.concat([runners, data[checkpoints]], axis=1)
+
+    meters = [VIEW_METERS[c] for c in checkpoints]
+    if view.startswith('gap_'):
+        adjusted = grade_adjusted_features(data[checkpoints].to_numpy(), meters, checkpoints, baseline=baseline)
+        values = adjusted.percent_change if view == 'gap_percent' else adjusted.adjusted_mps
+        return adjusted.to_frame(values, runners)
+
+    features = segment_features(data[checkpoints].to_numpy(), meters, checkpoints, baseline=baseline)
+    if view == 'percent':
+        values = features.percent_change
+    elif view == 'min_mile':
+        values = features.pace('min_mile')
+    else:
+        values = features.speed(view)
+    return features.to_frame(values, runners)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build race store partitions from RaceTimeSeconds.csv.')
+    parser.add_argument('source', nargs='?', help='CSV to read; defaults to the edition\'s crawl output')
+    parser.add_argument('--year', nargs='+', default=[str(RACE_YEAR)],
+                        help='Editions to build, e.g. 2023 or 2019-2024')
+    parser.add_argument('--out', default=STORE_PATH)
+    args = parser.parse_args()
+    years = parse_years(args.year)
+    if args.source and len(years) > 1:
+        parser.error('A source CSV can only be given for a single year')
+    for year in years:
+        build_store(args.source, args.out, year)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,147 @@
+import csv
+import io
+import os
+import sys
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.data.detail_parser import RunnerRecord
+from src.data.split_times import MISSING, SPLIT_COLUMNS, format_hms, format_ms, hms_to_seconds
+
+
+SPLIT_INDEX = {label: i for i, label in enumerate(SPLIT_COLUMNS)}
+# Runners without a net finish time have it labelled 'Finish Net *'
+LABEL_ALIASES = {'Finish Net *': 'Finish Net'}
+
+RAW_DIR = os.path.join('data', 'Raw')
+PROCESSED_DIR = os.path.join('data', 'processed')
+
+
+class SplitSink:
+    """Columnar buffer that streams parsed runners to the output CSVs.
+
+    Runners are packed into preallocated arrays (integer seconds, pace in
+    seconds per mile, miles per hour) and written out ``chunk_size`` at a
+    time, so memory stays flat for any field size. Each flush appends to
+    RaceTime.csv, MinMile.csv and MilesPerHour.csv in ``raw_dir`` and
+    RaceTimeSeconds.csv in ``processed_dir``.
+
+    A fresh run writes to ``.part`` files next to the outputs and moves them
+    into place on close, and only if at least one runner was written, so a
+    run that produces nothing (no network, empty cache) leaves the existing
+    files alone. With ``resume`` the run appends to the ``.part`` files an
+    interrupted run left behind, or else to the outputs themselves.
+    """
+
+    def __init__(self, raw_dir: str = RAW_DIR, processed_dir: str = PROCESSED_DIR,
+                 chunk_size: int = 1024, resume: bool = False,
+                 on_flush: Optional[Callable[[List[str]], None]] = None):
+        self.chunk_size = chunk_size
+        self.on_flush = on_flush
+        self.targets: Dict[str, str] = {
+            'RaceTime': os.path.join(raw_dir, 'RaceTime.csv'),
+            'MinMile': os.path.join(raw_dir, 'MinMile.csv'),
+            'MilesPerHour': os.path.join(raw_dir, 'MilesPerHour.csv'),
+            'RaceTimeSeconds': os.path.join(processed_dir, 'RaceTimeSeconds.csv'),
+        }
+        staged = {name: f'{path}.part' for name, path in self.targets.items()}
+        for name, path in staged.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if not resume and os.path.exists(path):
+                os.remove(path)
+        # Resuming a run that never closed keeps filling its .part files;
+        # resuming a finished one appends to the outputs directly
+        self.staging = not resume or any(os.path.exists(path) for path in staged.values())
+        self.paths: Dict[str, str] = staged if self.staging else dict(self.targets)
+
+        n_splits = len(SPLIT_COLUMNS)
+        self.names = np.empty(chunk_size, dtype=object)
+        self.bibs = np.empty(chunk_size, dtype=object)
+        self.seconds = np.zeros((chunk_size, n_splits), dtype=np.int32)
+        self.pace = np.zeros((chunk_size, n_splits), dtype=np.int32)
+        self.mph = np.zeros((chunk_size, n_splits), dtype=np.float64)
+        self.keys: List[str] = []
+        self.count = 0
+        self.written = 0
+
+    def __enter__(self) -> 'SplitSink':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def append(self, key: str, record: RunnerRecord) -> bool:
+        """Buffer one runner. Returns False if the runner has no split time at all.
+
+        A checkpoint the runner's chip was not read at ('–' on the page) is
+        kept as MISSING (NaN miles per hour), so the race store's quality
+        screen can repair or flag it.
+        """
+        row = self.count
+        self.seconds[row] = MISSING
+        self.pace[row] = MISSING
+        self.mph[row] = np.nan
+        found = 0
+        for split in record.splits:
+            column = SPLIT_INDEX.get(LABEL_ALIASES.get(split.label, split.label))
+            if column is None:
+                continue
+            seconds = hms_to_seconds(split.time)
+            if seconds is None:
+                continue
+            pace = hms_to_seconds(split.min_mile)
+            self.seconds[row, column] = seconds
+            self.pace[row, column] = MISSING if pace is None else pace
+            self.mph[row, column] = np.nan if split.mph is None else split.mph
+            found += 1
+        if not found:
+            return False
+
+        self.names[row] = sys.intern(record.name or '')
+        self.bibs[row] = sys.intern(record.bib or '')
+        self.keys.append(key)
+        self.count += 1
+        if self.count == self.chunk_size:
+            self.flush()
+        return True
+
+    def _write(self, name: str, values: List[List]) -> None:
+        path = self.paths[name]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        if not os.path.exists(path):
+            writer.writerow(['name', 'bib'] + SPLIT_COLUMNS)
+        for i, row in enumerate(values):
+            writer.writerow([self.names[i], self.bibs[i]] + row)
+        with open(path, 'a', encoding='utf-8', newline='') as f:
+            f.write(buffer.getvalue())
+
+    def flush(self) -> None:
+        """Append the buffered runners to every output file."""
+        n = self.count
+        if n == 0:
+            return
+        self._write('RaceTime', format_hms(self.seconds[:n]).tolist())
+        self._write('MinMile', format_ms(self.pace[:n]).tolist())
+        mph = self.mph[:n].astype(object)
+        mph[np.isnan(self.mph[:n])] = ''
+        self._write('MilesPerHour', mph.tolist())
+        self._write('RaceTimeSeconds', self.seconds[:n].tolist())
+
+        keys = self.keys
+        self.keys = []
+        self.count = 0
+        self.written += n
+        if self.on_flush is not None:
+            self.on_flush(keys)
+
+    def close(self) -> None:
+        """Flush, then move the .part files over the outputs if any runner was written."""
+        self.flush()
+        if not self.staging:
+            return
+        # .part files only exist once a chunk has been flushed to them
+        for name, path in self.paths.items():
+            if os.path.exists(path):
+                os.replace(path, self.targets[name])
@@ -0,0 +1,170 @@
+import argparse
+import logging
+import os
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.data.editions import RACE_YEAR, year_dir
+
+logger = logging.getLogger(__name__)
+
+# Checkpoints kept from the detail page, in output column order
+SPLIT_COLUMNS = ['5K', '10K', '15K', '20K', 'HALF', '25K', '30K', '35K', '40K', 'Finish Net']
+SPLIT_METERS = np.array([5000, 10000, 15000, 20000, 21097.5, 25000, 30000, 35000, 40000, 42195])
+METERS_PER_MILE = 1609.344
+
+# Sentinel for '–' markers and anything else that is not a clock time
+MISSING = -1
+
+
+def hms_to_seconds(value: Optional[str]) -> Optional[int]:
+    """Convert a single 'HH:MM:SS' or 'MM:SS' string to whole seconds, None if missing."""
+    if not value:
+        return None
+    seconds = 0
+    for part in value.split(':'):
+        if not part.isdigit():
+            return None
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def to_seconds(values) -> np.ndarray:
+    """Convert an array of 'H:MM:SS' / 'MM:SS' strings to int32 seconds.
+
+    Works on any shape. Hours may exceed 24. Cells that are not clock times
+    ('–', '-', empty, NaN) become MISSING.
+    """
+    strings = np.asarray(values, dtype=object)
+    shape = strings.shape
+    # Non-ASCII markers such as '–' turn into '?' and fail the digit check below
+    text = np.char.encode(strings.reshape(-1).astype(str), 'ascii', 'replace')
+    text = np.char.strip(text)
+
+    # Left-pad everything to a common [H]HH:MM:SS layout
+    colons = np.char.count(text, b':')
+    text = np.where(colons == 1, np.char.add(b'0:', text), text)
+    width = max(int(np.char.str_len(text).max(initial=0)), 8)
+    text = np.char.rjust(text, width, b'0')
+
+    digits = np.frombuffer(text.astype(f'S{width}').tobytes(), dtype=np.uint8)
+    digits = digits.reshape(-1, width).astype(np.int32) - ord('0')
+    colon = ord(':') - ord('0')
+
+    is_digit = (digits >= 0) & (digits <= 9)
+    digit_cols = np.ones(width, dtype=bool)
+    digit_cols[[width - 6, width - 3]] = False
+    valid = (
+        (colons >= 1) & (colons <= 2)
+        & (digits[:, width - 6] == colon) & (digits[:, width - 3] == colon)
+        & is_digit[:, digit_cols].all(axis=1)
+    )
+
+    hour_weights = 10 ** np.arange(width - 7, -1, -1, dtype=np.int64)
+    hours = digits[:, :width - 6] @ hour_weights
+    minutes = digits[:, width - 5] * 10 + digits[:, width - 4]
+    seconds = digits[:, width - 2] * 10 + digits[:, width - 1]
+    total = np.where(valid, hours * 3600 + minutes * 60 + seconds, MISSING)
+    return total.astype(np.int32).reshape(shape)
+
+
+def format_hms(seconds: np.ndarray) -> np.ndarray:
+    """Format an array of seconds as 'HH:MM:SS' strings; MISSING becomes '-'."""
+    seconds = np.asarray(seconds, dtype=np.int64)
+    parts = [seconds // 3600, seconds // 60 % 60, seconds % 60]
+    padded = [np.char.zfill(part.astype(str), 2) for part in parts]
+    text = np.char.add(np.char.add(np.char.add(padded[0], ':'), np.char.add(padded[1], ':')), padded[2])
+    return np.where(seconds == MISSING, '-', text)
+
+
+def format_ms(seconds: np.ndarray) -> np.ndarray:
+    """Format an array of seconds as 'MM:SS', falling back to 'HH:MM:SS' past an hour; MISSING becomes '-'."""
+    seconds = np.asarray(seconds, dtype=np.int64)
+    short = np.char.add(np.char.add(np.char.zfill((seconds // 60).astype(str), 2), ':'),
+                        np.char.zfill((seconds % 60).astype(str), 2))
+    return np.where((seconds >= 3600) | (seconds == MISSING), format_hms(seconds), short)
+
+
+def segment_seconds(seconds: np.ndarray) -> np.ndarray:
+    """Time spent in each segment of a runner x checkpoint matrix of cumulative seconds."""
+    seconds = np.asarray(seconds, dtype=np.int32)
+    segments = np.diff(seconds, axis=1, prepend=0)
+    missing = (seconds == MISSING) | np.pad(seconds[:, :-1] == MISSING, ((0, 0), (1, 0)))
+    return np.where(missing, MISSING, segments).astype(np.int32)
+
+
+def pace_per_mile(seconds: np.ndarray, meters: Sequence[float] = SPLIT_METERS) -> np.ndarray:
+    """Segment pace in whole seconds per mile (rounded up) between consecutive checkpoints.
+
+    This is not the site's min/mile column: results.baa.org measures some
+    segments from the mile markers dropped by the detail parser and rounds
+    differently, so the values disagree for some runners.
+    """
+    segments = segment_seconds(seconds)
+    miles = np.diff(np.asarray(meters, dtype=np.float64), prepend=0) / METERS_PER_MILE
+    pace = np.ceil(segments / miles)
+    return np.where(segments == MISSING, MISSING, pace).astype(np.int32)
+
+
+def miles_per_hour(seconds: np.ndarray, meters: Sequence[float] = SPLIT_METERS) -> np.ndarray:
+    """Segment speed in miles per hour, NaN where a split is missing."""
+    segments = segment_seconds(seconds).astype(np.float64)
+    miles = np.diff(np.asarray(meters, dtype=np.float64), prepend=0) / METERS_PER_MILE
+    with np.errstate(divide='ignore'):
+        mph = np.round(miles / (segments / 3600), 2)
+    return np.where(segments > 0, mph, np.nan)
+
+
+def race_time_seconds(race_time: pd.DataFrame, columns: Sequence[str] = SPLIT_COLUMNS,
+                      drop_missing: bool = True) -> pd.DataFrame:
+    """RaceTime frame (name, bib, HH:MM:SS splits) to a RaceTimeSeconds frame."""
+    seconds = to_seconds(race_time[list(columns)].to_numpy())
+    out = pd.DataFrame(seconds, columns=list(columns), index=race_time.index)
+    out.insert(0, 'bib', race_time['bib'])
+    out.insert(0, 'name', race_time['name'])
+    if drop_missing:
+        out = out[(seconds != MISSING).all(axis=1)]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert RaceTime.csv split times to seconds.')
+    parser.add_argument('race_time', nargs='?',
+                        default=os.path.join(year_dir(os.path.join('data', 'Raw'), RACE_YEAR), 'RaceTime.csv'))
+    parser.add_argument('--out',
+                        default=os.path.join(year_dir(os.path.join('data', 'processed'), RACE_YEAR), 'RaceTimeSeconds.csv'))
+    parser.add_argument('--derive-pace', action='store_true',
+                        help='Also write pace and speed derived from the seconds to --out-dir. These are '
+                             'recomputed between checkpoints and differ from the scraped MinMile.csv '
+                             'and MilesPerHour.csv, which are never overwritten')
+    parser.add_argument('--out-dir',
+                        default=year_dir(os.path.join('data', 'interim', 'derived_pace'), RACE_YEAR),
+                        help='Directory for the --derive-pace files')
+    args = parser.parse_args()
+
+    race_time = pd.read_csv(args.race_time, dtype=str, encoding='latin1')
+    start = time.perf_counter()
+    # Missing splits stay as MISSING; the race store screens and repairs them
+    seconds = race_time_seconds(race_time, drop_missing=False)
+    incomplete = int((seconds[SPLIT_COLUMNS].to_numpy() == MISSING).any(axis=1).sum())
+    logger.info(f"Converted {len(race_time)} runners in {time.perf_counter() - start:.3f}s, "
+                f"{incomplete} with missing splits")
+    seconds.to_csv(args.out, index=False)
+
+    if args.derive_pace:
+        matrix = seconds[SPLIT_COLUMNS].to_numpy()
+        # Kept apart from data/Raw so the scraped values are never replaced by derived ones
+        os.makedirs(args.out_dir, exist_ok=True)
+        runners = seconds[['name', 'bib']].reset_index(drop=True)
+        pace = pd.DataFrame(format_ms(pace_per_mile(matrix)), columns=SPLIT_COLUMNS)
+        mph = pd.DataFrame(miles_per_hour(matrix), columns=SPLIT_COLUMNS)
+        pd.concat([runners, pace], axis=1).to_csv(os.path.join(args.out_dir, 'MinMile.csv'), index=False)
+        pd.concat([runners, mph], axis=1).to_csv(os.path.join(args.out_dir, 'MilesPerHour.csv'), index=False)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,192 @@
+import argparse
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.features.segment_speed import segment_features
+
+
+logger = logging.getLogger(__name__)
+
+ROUTE_PROFILE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                              '..', 'visualization', 'RouteProfile.csv'))
+# Elevations in the route profile are whole metres about 90 m apart, which
+# alone gives +-1% grade noise; elevation is averaged over this window first
+SMOOTH_METERS = 400
+
+# Minetti et al. (2002) energy cost of running in J/kg/m as a polynomial in
+# the grade (rise over run), highest power first; 3.6 on the flat
+MINETTI_COEFFICIENTS = [155.4, -30.4, -43.3, 46.3, 19.5, 3.6]
+# The fit is only valid over the grades it was measured on
+MAX_GRADE = 0.45
+
+
+def cost_factor(grade) -> np.ndarray:
+    """Energy cost of running at ``grade`` relative to running on the flat."""
+    grade = np.clip(np.asarray(grade, dtype=np.float64), -MAX_GRADE, MAX_GRADE)
+    return np.polyval(MINETTI_COEFFICIENTS, grade) / MINETTI_COEFFICIENTS[-1]
+
+
+@dataclass
+class CourseModel:
+    """Elevation, grade and effort along the course, indexed by distance from the start.
+
+    ``meters`` and ``elevation`` are the (smoothed) profile points; ``grade``
+    holds the grade of each interval between them. ``flat_meters`` is the
+    cumulative flat-equivalent distance: how far one could run on the flat
+    for the effort of reaching each point, so the effort of any stretch is a
+    difference of two interpolations.
+    """
+    meters: np.ndarray
+    elevation: np.ndarray
+    grade: np.ndarray
+    flat_meters: np.ndarray
+
+    @property
+    def length(self) -> float:
+        return float(self.meters[-1])
+
+    def elevation_at(self, meters) -> np.ndarray:
+        """Elevation at any distances, interpolated linearly between profile points."""
+        return np.interp(meters, self.meters, self.elevation)
+
+    def grade_at(self, meters) -> np.ndarray:
+        """Grade of the profile interval each distance falls in."""
+        index = np.searchsorted(self.meters, meters, side='right') - 1
+        return self.grade[np.clip(index, 0, len(self.grade) - 1)]
+
+    def segment_grade(self, start, end) -> np.ndarray:
+        """Net grade from ``start`` to ``end`` (rise over distance)."""
+        start, end = np.asarray(start, dtype=np.float64), np.asarray(end, dtype=np.float64)
+        return (self.elevation_at(end) - self.elevation_at(start)) / (end - start)
+
+    def segment_cost(self, start, end) -> np.ndarray:
+        """Effort of running from ``start`` to ``end`` relative to the same distance on the flat.
+
+        Unlike the cost of the net grade this counts every climb and descent
+        in between, so a hilly segment with no net rise still costs more.
+        """
+        start, end = np.asarray(start, dtype=np.float64), np.asarray(end, dtype=np.float64)
+        flat = np.interp(end, self.meters, self.flat_meters) - np.interp(start, self.meters, self.flat_meters)
+        return flat / (end - start)
+
+
+def build_course(profile: pd.DataFrame, smooth_meters: float = SMOOTH_METERS) -> CourseModel:
+    """Build the course model from a route profile frame.
+
+    Args:
+        profile: 'Distance from Start (km)' and 'Height Above Sea Level (m)'
+                 columns, as in RouteProfile.csv.
+        smooth_meters: Width of the moving average applied to the elevation;
+                       0 keeps the profile as it is.
+    """
+    meters = profile['Distance from Start (km)'].to_numpy(dtype=np.float64) * 1000
+    elevation = profile['Height Above Sea Level (m)'].to_numpy(dtype=np.float64)
+
+    if smooth_meters > 0:
+        # Average over the window from the running integral of elevation, so
+        # uneven point spacing is weighted correctly; the window shrinks at the ends
+        area = np.concatenate([[0], np.cumsum(np.diff(meters) * (elevation[1:] + elevation[:-1]) / 2)])
+        lower = np.maximum(meters - smooth_meters / 2, meters[0])
+        upper = np.minimum(meters + smooth_meters / 2, meters[-1])
+        elevation = (np.interp(upper, meters, area) - np.interp(lower, meters, area)) / (upper - lower)
+
+    grade = np.diff(elevation) / np.diff(meters)
+    flat_meters = np.concatenate([[0], np.cumsum(np.diff(meters) * cost_factor(grade))])
+    return CourseModel(meters=meters, elevation=elevation, grade=grade, flat_meters=flat_meters)
+
+
+@lru_cache(maxsize=None)
+def load_course(path: str = ROUTE_PROFILE, smooth_meters: float = SMOOTH_METERS) -> CourseModel:
+    """The course model of a route profile CSV, built once per process."""
+    return build_course(pd.read_csv(path), smooth_meters)
+
+
+@dataclass
+class GradeAdjustedFeatures:
+    """Per-segment grade and grade-adjusted speed for a runner x checkpoint matrix.
+
+    ``grade`` and ``cost`` have one value per segment (the stretch up to each
+    checkpoint from the one before it, or from the start); the speeds are
+    runner x segment. Grade-adjusted speed is the speed on the flat that
+    would take the same effort.
+    """
+    checkpoints: List[str]
+    grade: np.ndarray
+    cost: np.ndarray
+    segment_mps: np.ndarray
+    adjusted_mps: np.ndarray
+    baseline: str
+    percent_change: np.ndarray
+
+    def to_frame(self, values: np.ndarray, runners: pd.DataFrame) -> pd.DataFrame:
+        """Attach one of the matrices to the runner columns (e.g. name, bib)."""
+        frame = pd.DataFrame(values, columns=self.checkpoints, index=runners.index)
+        return pd.concat([runners, frame], axis=1)
+
+
+def grade_adjusted_features(seconds: np.ndarray, meters: Sequence[float], checkpoints: Sequence[str],
+                            course: Optional[CourseModel] = None, baseline: str = '5K') -> GradeAdjustedFeatures:
+    """Grade-adjust every runner's segment speeds in one array pass.
+
+    The course terms depend only on the checkpoints, so they are computed
+    once per segment and broadcast over the runners.
+
+    Args:
+        seconds: Runner x checkpoint matrix of cumulative race seconds;
+                 negative values and NaN count as missing.
+        meters: Distance of each checkpoint from the start.
+        checkpoints: Checkpoint names, in the same order as the columns.
+        course: Course model; the Boston route profile when None.
+        baseline: Checkpoint whose adjusted speed the percent change is relative to.
+    """
+    course = course or load_course()
+    checkpoints = list(checkpoints)
+    # Checkpoints past the end of the profile (which stops at 42.2 km) are clamped
+    ends = np.minimum(np.asarray(meters, dtype=np.float64), course.length)
+    starts = np.concatenate([[0], ends[:-1]])
+    grade = course.segment_grade(starts, ends)
+    cost = course.segment_cost(starts, ends)
+
+    features = segment_features(seconds, meters, checkpoints, baseline=baseline)
+    adjusted_mps = features.segment_mps * cost
+    with np.errstate(divide='ignore', invalid='ignore'):
+        base = adjusted_mps[:, [checkpoints.index(baseline)]]
+        percent_change = (adjusted_mps - base) / base * 100
+
+    return GradeAdjustedFeatures(
+        checkpoints=checkpoints,
+        grade=grade,
+        cost=cost,
+        segment_mps=features.segment_mps,
+        adjusted_mps=adjusted_mps,
+        baseline=baseline,
+        percent_change=percent_change,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the grade and effort of each course segment.')
+    parser.add_argument('profile', nargs='?', default=ROUTE_PROFILE)
+    parser.add_argument('--smooth', type=float, default=SMOOTH_METERS, help='Elevation smoothing window in metres')
+    args = parser.parse_args()
+
+    from src.data.race_store import VIEW_METERS
+
+    course = load_course(args.profile, args.smooth)
+    ends = np.minimum([VIEW_METERS[c] for c in VIEW_METERS], course.length)
+    starts = np.concatenate([[0], ends[:-1]])
+    for name, start, end, grade, cost in zip(VIEW_METERS, starts, ends, course.segment_grade(starts, ends),
+                                             course.segment_cost(starts, ends)):
+        logger.info(f"{name:>10}: {start / 1000:6.2f}-{end / 1000:6.2f} km, "
+                    f"grade {grade * 100:+.2f}%, effort x{cost:.3f}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main()
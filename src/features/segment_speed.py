@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.data.split_times import METERS_PER_MILE
+
+# Multiply metres per second by these to change units
+SPEED_UNITS = {'mps': 1.0, 'kmh': 3.6, 'mph': 3600 / METERS_PER_MILE}
+# Divide these by metres per second to get minutes per distance unit
+PACE_UNITS = {'min_km': 1000 / 60, 'min_mile': METERS_PER_MILE / 60}
+
+
+@dataclass
+class SegmentFeatures:
+    """Per-segment and cumulative speeds for a runner x checkpoint matrix."""
+    checkpoints: List[str]
+    meters: np.ndarray
+    segment_mps: np.ndarray
+    cumulative_mps: np.ndarray
+    baseline: str
+    percent_change: np.ndarray
+
+    def speed(self, unit: str = 'mps', cumulative: bool = False) -> np.ndarray:
+        """Segment (or start-to-checkpoint) speed in 'mps', 'kmh' or 'mph'."""
+        mps = self.cumulative_mps if cumulative else self.segment_mps
+        return mps * SPEED_UNITS[unit]
+
+    def pace(self, unit: str = 'min_mile', cumulative: bool = False) -> np.ndarray:
+        """Segment (or start-to-checkpoint) pace in 'min_mile' or 'min_km'."""
+        mps = self.cumulative_mps if cumulative else self.segment_mps
+        return PACE_UNITS[unit] / mps
+
+    def to_frame(self, values: np.ndarray, runners: pd.DataFrame) -> pd.DataFrame:
+        """Attach one of the matrices to the runner columns (e.g. name, bib)."""
+        frame = pd.DataFrame(values, columns=self.checkpoints, index=runners.index)
+        return pd.concat([runners, frame], axis=1)
+
+
+def segment_features(seconds: np.ndarray, meters: Sequence[float], checkpoints: Sequence[str],
+                     baseline: str = '5K', dtype=np.float64) -> SegmentFeatures:
+    """Compute every speed feature from cumulative split seconds in one pass.
+
+    Args:
+        seconds: Runner x checkpoint matrix of cumulative race seconds.
+                 Negative values (the MISSING marker) and NaN count as missing.
+        meters: Distance of each checkpoint from the start.
+        checkpoints: Checkpoint names, in the same order as the columns.
+        baseline: Checkpoint whose segment speed the percent change is relative to.
+        dtype: Float type of the outputs; float32 halves memory for very large fields.
+
+    Returns:
+        SegmentFeatures holding segment and cumulative speed in m/s and the
+        percent change of each segment's speed against the baseline segment.
+    """
+    checkpoints = list(checkpoints)
+    meters = np.asarray(meters, dtype=dtype)
+    seconds = np.asarray(seconds, dtype=dtype)
+    seconds = np.where(seconds < 0, np.nan, seconds)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        segment_mps = np.diff(meters, prepend=0) / np.diff(seconds, axis=1, prepend=0)
+        cumulative_mps = meters / seconds
+        base = segment_mps[:, [checkpoints.index(baseline)]]
+        percent_change = (segment_mps - base) / base * 100
+
+    return SegmentFeatures(
+        checkpoints=checkpoints,
+        meters=meters,
+        segment_mps=segment_mps,
+        cumulative_mps=cumulative_mps,
+        baseline=baseline,
+        percent_change=percent_change,
+    )
@@ -0,0 +1,114 @@
+import argparse
+import logging
+from dataclasses import dataclass
+from typing import Dict, Sequence
+
+import numpy as np
+
+from src.features.segment_speed import segment_features
+
+
+logger = logging.getLogger(__name__)
+
+# Bit flags stored per runner in the quality mask
+FLAG_MISSING = 1            # a split is absent and could not be filled in
+FLAG_NON_MONOTONIC = 2      # cumulative time goes backwards or stands still
+FLAG_IMPLAUSIBLE_SPEED = 4  # a segment is faster or slower than any real runner
+FLAG_REPAIRED = 8           # an isolated missing split was interpolated
+
+# Flags that make a runner unusable; a repaired runner is still fine
+PROBLEMS = FLAG_MISSING | FLAG_NON_MONOTONIC | FLAG_IMPLAUSIBLE_SPEED
+
+FLAG_NAMES = {
+    FLAG_MISSING: 'missing',
+    FLAG_NON_MONOTONIC: 'non_monotonic',
+    FLAG_IMPLAUSIBLE_SPEED: 'implausible_speed',
+    FLAG_REPAIRED: 'repaired',
+}
+
+# Segment speed limits in m/s; the fastest marathon 5K splits are ~6 m/s and
+# anything under 0.5 m/s is slower than walking with stops
+MAX_SEGMENT_MPS = 6.5
+MIN_SEGMENT_MPS = 0.5
+
+
+@dataclass
+class QualityReport:
+    """Outcome of screening a runner x checkpoint matrix of split seconds."""
+    seconds: np.ndarray
+    flags: np.ndarray
+
+    @property
+    def usable(self) -> np.ndarray:
+        """Runners with no problems left after repair."""
+        return (self.flags & PROBLEMS) == 0
+
+    def counts(self) -> Dict[str, int]:
+        counts = {name: int(((self.flags & flag) != 0).sum()) for flag, name in FLAG_NAMES.items()}
+        counts['usable'] = int(self.usable.sum())
+        return counts
+
+
+def screen_splits(seconds: np.ndarray, meters: Sequence[float], checkpoints: Sequence[str],
+                  repair: bool = True,
+                  max_mps: float = MAX_SEGMENT_MPS,
+                  min_mps: float = MIN_SEGMENT_MPS) -> QualityReport:
+    """Flag (and optionally repair) bad splits for every runner in one pass.
+
+    Args:
+        seconds: Runner x checkpoint matrix of cumulative seconds. Negative
+                 values and NaN are treated as missing.
+        meters: Distance of each checkpoint from the start.
+        checkpoints: Checkpoint names in column order.
+        repair: Fill a missing split that has both neighbours by
+                interpolating on distance.
+        max_mps: Fastest believable segment speed.
+        min_mps: Slowest believable segment speed.
+
+    Returns:
+        QualityReport with the (repaired) seconds as floats, NaN where still
+        missing, and a uint8 bit mask of problems per runner.
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    seconds = np.where(seconds < 0, np.nan, seconds)
+    meters = np.asarray(meters, dtype=np.float64)
+    flags = np.zeros(len(seconds), dtype=np.uint8)
+
+    if repair and seconds.shape[1] > 2:
+        before, after = seconds[:, :-2], seconds[:, 2:]
+        fraction = (meters[1:-1] - meters[:-2]) / (meters[2:] - meters[:-2])
+        filled = np.round(before + (after - before) * fraction)
+        fixable = np.isnan(seconds[:, 1:-1]) & ~np.isnan(before) & ~np.isnan(after)
+        seconds[:, 1:-1] = np.where(fixable, filled, seconds[:, 1:-1])
+        flags[fixable.any(axis=1)] |= FLAG_REPAIRED
+
+    missing = np.isnan(seconds)
+    flags[missing.any(axis=1)] |= FLAG_MISSING
+
+    with np.errstate(invalid='ignore'):
+        steps = np.diff(seconds, axis=1, prepend=0)
+        flags[(steps <= 0).any(axis=1)] |= FLAG_NON_MONOTONIC
+
+        mps = segment_features(seconds, meters, checkpoints, baseline=checkpoints[0]).segment_mps
+        implausible = (mps > max_mps) | (mps < min_mps)
+        flags[(implausible & (steps > 0)).any(axis=1)] |= FLAG_IMPLAUSIBLE_SPEED
+
+    return QualityReport(seconds=seconds, flags=flags)
+
+
+def main():
+    from src.data.race_store import STORE_PATH, load_seconds
+
+    parser = argparse.ArgumentParser(description='Summarise the quality mask of the race store.')
+    parser.add_argument('store', nargs='?', default=STORE_PATH)
+    args = parser.parse_args()
+
+    data = load_seconds(args.store)
+    for flag, name in FLAG_NAMES.items():
+        logger.info(f"{name:>18}: {int(((data['quality'] & flag) != 0).sum())}")
+    logger.info(f"{'usable':>18}: {int(((data['quality'] & PROBLEMS) == 0).sum())} of {len(data)}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main()
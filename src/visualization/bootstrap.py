@@ -0,0 +1,181 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.visualization.grouping import shoe_groups
+
+
+logger = logging.getLogger(__name__)
+
+REPORTS_DIR = 'reports'
+RESAMPLES = 2000
+# Resamples drawn per batch; each batch has its own child seed so the result
+# only depends on the seed, not on how batches are spread over workers
+BATCH_SIZE = 100
+
+
+@dataclass
+class BootstrapBands:
+    """Percentile bootstrap intervals for each group's mean curve and trendline slope."""
+    names: List[str]
+    checkpoints: List[str]
+    x: np.ndarray
+    count: np.ndarray
+    level: float
+    mean: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    slope: np.ndarray
+    slope_lower: np.ndarray
+    slope_upper: np.ndarray
+
+    def select(self, keep: np.ndarray) -> 'BootstrapBands':
+        """Only the groups where ``keep`` is True, in the same order."""
+        keep = np.flatnonzero(keep)
+        return BootstrapBands(
+            names=[self.names[i] for i in keep],
+            checkpoints=self.checkpoints,
+            x=self.x,
+            count=self.count[keep],
+            level=self.level,
+            mean=self.mean[keep],
+            lower=self.lower[keep],
+            upper=self.upper[keep],
+            slope=self.slope[keep],
+            slope_lower=self.slope_lower[keep],
+            slope_upper=self.slope_upper[keep],
+        )
+
+    def curves_frame(self) -> pd.DataFrame:
+        """One row per group and checkpoint with the mean and its interval."""
+        groups, checkpoints = len(self.names), len(self.checkpoints)
+        return pd.DataFrame({
+            'group': np.repeat(self.names, checkpoints),
+            'checkpoint': np.tile(self.checkpoints, groups),
+            'x': np.tile(self.x, groups),
+            'mean': self.mean.ravel(),
+            'lower': self.lower.ravel(),
+            'upper': self.upper.ravel(),
+        })
+
+    def slopes_frame(self) -> pd.DataFrame:
+        """One row per group with its trendline slope and interval."""
+        return pd.DataFrame({
+            'group': self.names,
+            'runners': self.count,
+            'slope': self.slope,
+            'lower': self.slope_lower,
+            'upper': self.slope_upper,
+        })
+
+    def export(self, directory: str = REPORTS_DIR, prefix: str = 'bootstrap') -> Tuple[str, str]:
+        """Write the curve and slope intervals as CSV files; returns their paths."""
+        os.makedirs(directory, exist_ok=True)
+        curves_path = os.path.join(directory, f'{prefix}_bands.csv')
+        slopes_path = os.path.join(directory, f'{prefix}_slopes.csv')
+        self.curves_frame().to_csv(curves_path, index=False)
+        self.slopes_frame().to_csv(slopes_path, index=False)
+        logger.info(f"Wrote bootstrap intervals to {curves_path} and {slopes_path}")
+        return curves_path, slopes_path
+
+
+def _resample_means(values: np.ndarray, size: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """Mean curves of ``size`` resamples (with replacement) of the rows of ``values``.
+
+    Draws are turned into a resample x runner count matrix with one
+    bincount, so every resample's mean is a row of a single matrix product.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(values)
+    draws = rng.integers(0, n, size=(size, n))
+    draws += np.arange(size)[:, None] * n
+    counts = np.bincount(draws.ravel(), minlength=size * n).reshape(size, n)
+    return counts @ values / n
+
+
+def _resample_batches(values: np.ndarray, sizes: Sequence[int],
+                      seeds: Sequence[np.random.SeedSequence]) -> np.ndarray:
+    return np.concatenate([_resample_means(values, size, seed) for size, seed in zip(sizes, seeds)])
+
+
+def bootstrap_curves(data: pd.DataFrame, checkpoints: Sequence[str], x: Sequence[float],
+                     families: Dict[str, Sequence[str]], groups: Optional[Sequence[str]] = None,
+                     resamples: int = RESAMPLES, level: float = 0.95, seed: int = 0,
+                     workers: int = 1, shoe_column: str = 'shoeChoice') -> BootstrapBands:
+    """Bootstrap every group's mean pace curve and trendline slope.
+
+    Runners are resampled within their group (family or leftover shoe, as in
+    ``group_curves``). The slope of the mean curve is a fixed linear
+    combination of it, so each resample's slope comes from one dot product.
+    Checkpoint values must be complete (e.g. from ``usable_only`` views).
+
+    Args:
+        data: One row per runner with a shoe column and the checkpoint columns.
+        checkpoints: Checkpoint columns to use, in order.
+        x: Position of each checkpoint on the trendline's x axis.
+        families: Family name -> keywords.
+        groups: Names of the groups to bootstrap (e.g. those with enough
+                runners); all groups when None.
+        resamples: Number of bootstrap resamples per group.
+        level: Coverage of the percentile intervals.
+        seed: Seed for reproducible intervals.
+        workers: Processes to spread the resamples over; 1 runs in-process.
+
+    Returns:
+        BootstrapBands with the intervals of every requested group.
+    """
+    codes, names, _ = shoe_groups(data[shoe_column], families)
+    wanted = list(groups) if groups is not None else names
+    values = data[list(checkpoints)].to_numpy(dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    # Least-squares slope of y on x is weights @ y
+    weights = (x - x.mean()) / ((x - x.mean()) ** 2).sum()
+    tail = (1 - level) / 2 * 100
+
+    sizes = [min(BATCH_SIZE, resamples - start) for start in range(0, resamples, BATCH_SIZE)]
+    group_seeds = np.random.SeedSequence(seed).spawn(len(names))
+    members = {name: values[codes == i] for i, name in enumerate(names)}
+
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        jobs = {}
+        for name in wanted:
+            batch_seeds = group_seeds[names.index(name)].spawn(len(sizes))
+            if pool is None:
+                jobs[name] = _resample_batches(members[name], sizes, batch_seeds)
+            else:
+                # Split the batches over the workers in contiguous runs
+                splits = np.array_split(np.arange(len(sizes)), workers)
+                jobs[name] = [pool.submit(_resample_batches, members[name],
+                                          [sizes[i] for i in split], [batch_seeds[i] for i in split])
+                              for split in splits if len(split)]
+        means = {name: job if pool is None else np.concatenate([f.result() for f in job])
+                 for name, job in jobs.items()}
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    boot = np.stack([means[name] for name in wanted])          # group x resample x checkpoint
+    boot_slopes = boot @ weights                                # group x resample
+    point = np.stack([members[name].mean(axis=0) for name in wanted])
+    lower, upper = np.percentile(boot, [tail, 100 - tail], axis=1)
+    slope_lower, slope_upper = np.percentile(boot_slopes, [tail, 100 - tail], axis=1)
+
+    return BootstrapBands(
+        names=wanted,
+        checkpoints=list(checkpoints),
+        x=x,
+        count=np.array([len(members[name]) for name in wanted]),
+        level=level,
+        mean=point,
+        lower=lower,
+        upper=upper,
+        slope=point @ weights,
+        slope_lower=slope_lower,
+        slope_upper=slope_upper,
+    )
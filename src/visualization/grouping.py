@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class GroupCurves:
+    """Mean pace curve, spread and trendline of every shoe family and leftover shoe.
+
+    Arrays are indexed by group; ``mean`` is group x checkpoint.
+    """
+    names: List[str]
+    is_family: np.ndarray
+    checkpoints: List[str]
+    x: np.ndarray
+    count: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+    slope: np.ndarray
+    intercept: np.ndarray
+
+    def select(self, keep: np.ndarray) -> 'GroupCurves':
+        """Only the groups where ``keep`` is True, in the same order."""
+        keep = np.flatnonzero(keep)
+        return GroupCurves(
+            names=[self.names[i] for i in keep],
+            is_family=self.is_family[keep],
+            checkpoints=self.checkpoints,
+            x=self.x,
+            count=self.count[keep],
+            mean=self.mean[keep],
+            std=self.std[keep],
+            slope=self.slope[keep],
+            intercept=self.intercept[keep],
+        )
+
+    def trendlines(self) -> Dict[str, Dict[str, float]]:
+        """Slope, intercept, std and runner count per group, keyed by name."""
+        return {
+            name: {'slope': self.slope[i], 'intercept': self.intercept[i],
+                   'std': self.std[i], 'n': int(self.count[i])}
+            for i, name in enumerate(self.names)
+        }
+
+
+def shoe_groups(shoes: pd.Series, families: Dict[str, Sequence[str]]) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """Give every runner a group code: its shoe family, or its own shoe if it has none.
+
+    Keywords are matched once per distinct shoe rather than once per runner.
+    A shoe goes to the first family with a keyword in its lowercased name.
+    Families come first, in the order given, followed by the unmatched shoes
+    in order of first appearance.
+
+    Returns:
+        Per-runner group codes, the group names and a per-group flag telling
+        families from single shoes.
+    """
+    shoe_codes, shoe_names = pd.factorize(shoes)
+    family_names = list(families)
+    group_of_shoe = np.empty(len(shoe_names), dtype=np.intp)
+    leftover: List[str] = []
+    for i, shoe in enumerate(shoe_names):
+        lowered = shoe.lower()
+        family = next((f for f, name in enumerate(family_names)
+                       if any(keyword in lowered for keyword in families[name])), None)
+        if family is None:
+            group_of_shoe[i] = len(family_names) + len(leftover)
+            leftover.append(shoe)
+        else:
+            group_of_shoe[i] = family
+    is_family = np.arange(len(family_names) + len(leftover)) < len(family_names)
+    return group_of_shoe[shoe_codes], family_names + leftover, is_family
+
+
+def group_curves(data: pd.DataFrame, checkpoints: Sequence[str], x: Sequence[float],
+                 families: Dict[str, Sequence[str]], shoe_column: str = 'shoeChoice') -> GroupCurves:
+    """Compute every group's curve statistics with one grouped reduction over the checkpoint matrix.
+
+    Args:
+        data: One row per runner with a shoe column and the checkpoint columns.
+        checkpoints: Checkpoint columns to use, in order.
+        x: Position of each checkpoint on the trendline's x axis.
+        families: Family name -> keywords, as used by ``shoe_groups``.
+        shoe_column: Column holding the shoe label.
+
+    Returns:
+        GroupCurves for all groups, including empty families (count 0);
+        filter them with ``select``. ``std`` is the spread of all of a
+        group's values, runners and checkpoints together, and missing
+        values are skipped.
+    """
+    codes, names, is_family = shoe_groups(data[shoe_column], families)
+    values = data[list(checkpoints)].to_numpy(dtype=np.float64)
+    n_groups, n_checkpoints = len(names), values.shape[1]
+
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    # Flat index of each (group, checkpoint) cell so one bincount sums them all
+    cells = (codes[:, None] * n_checkpoints + np.arange(n_checkpoints)).ravel()
+    size = n_groups * n_checkpoints
+    sums = np.bincount(cells, weights=filled.ravel(), minlength=size).reshape(n_groups, n_checkpoints)
+    cell_counts = np.bincount(cells, weights=valid.ravel(), minlength=size).reshape(n_groups, n_checkpoints)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / cell_counts
+        overall = sums.sum(axis=1) / cell_counts.sum(axis=1)
+        squares = np.where(valid, (values - overall[codes, None]) ** 2, 0.0).sum(axis=1)
+        std = np.sqrt(np.bincount(codes, weights=squares, minlength=n_groups) / cell_counts.sum(axis=1))
+
+    x = np.asarray(x, dtype=np.float64)
+    slope = np.full(n_groups, np.nan)
+    intercept = np.full(n_groups, np.nan)
+    fittable = ~np.isnan(mean).any(axis=1)
+    if fittable.any():
+        slope[fittable], intercept[fittable] = np.polyfit(x, mean[fittable].T, 1)
+
+    return GroupCurves(
+        names=names,
+        is_family=is_family,
+        checkpoints=list(checkpoints),
+        x=x,
+        count=np.bincount(codes, minlength=n_groups),
+        mean=mean,
+        std=std,
+        slope=slope,
+        intercept=intercept,
+    )
@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import os
+import pickle
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import patsy
+from scipy import stats
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join('data', 'interim', 'model_cache')
+FORMULA_RHS = "C(ShoeFamily, Sum) + C(Distance, Sum) + C(ShoeFamily, Sum):C(Distance, Sum)"
+
+
+@dataclass
+class RandomInterceptResults:
+    """REML fit of the family x distance model with a random intercept per runner.
+
+    ``params`` and ``bse`` use the same names as statsmodels' MixedLM,
+    including the 'Group Var' row (the random intercept variance relative
+    to ``scale``).
+    """
+    params: pd.Series
+    bse: pd.Series
+    scale: float
+    group_var: float
+    nobs: int
+    ngroups: int
+
+    @property
+    def tvalues(self) -> pd.Series:
+        return self.params / self.bse
+
+    @property
+    def pvalues(self) -> pd.Series:
+        return pd.Series(2 * stats.norm.sf(np.abs(self.tvalues)), index=self.params.index)
+
+    def summary(self) -> str:
+        table = pd.DataFrame({
+            'Coef.': self.params,
+            'Std.Err.': self.bse,
+            'z': self.tvalues,
+            'P>|z|': self.pvalues,
+        })
+        header = (f"Random intercept model (REML)\n"
+                  f"No. observations: {self.nobs}  No. runners: {self.ngroups}  "
+                  f"Scale: {self.scale:.4f}  Runner variance: {self.group_var:.4f}\n")
+        return header + table.round(4).to_string()
+
+
+def is_balanced(values: np.ndarray) -> bool:
+    """True when every runner has a value at every checkpoint."""
+    return values.ndim == 2 and values.shape[1] > 1 and not np.isnan(values).any()
+
+
+def fit_random_intercept(values: np.ndarray, families: Sequence, checkpoints: Sequence[str],
+                         family_order: Optional[List[str]] = None) -> RandomInterceptResults:
+    """Fit the model from per-runner and per-cell sums instead of the long table.
+
+    With every runner measured at every checkpoint and a saturated
+    family x distance fixed part, the GLS estimates are the cell means and
+    the REML variance components have the closed ANOVA form:
+    scale = MS(residual) and runner variance = (MS(runner) - MS(residual)) / J,
+    truncated at zero.
+
+    Args:
+        values: Runner x checkpoint matrix of the response, without gaps.
+        families: Shoe family of every runner.
+        checkpoints: Checkpoint names in column order.
+        family_order: Family levels in coding order; sorted when None, as
+                      pandas does for a plain categorical.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not is_balanced(values):
+        raise ValueError("The fast path needs every runner at every checkpoint")
+    family_order = list(family_order) if family_order is not None else sorted(pd.unique(np.asarray(families)))
+    codes = pd.Categorical(families, categories=family_order).codes
+    n_runners, n_checkpoints = values.shape
+    n_families = len(family_order)
+
+    # Sufficient statistics: runner totals, family x checkpoint sums and the sum of squares
+    runner_sums = values.sum(axis=1)
+    counts = np.bincount(codes, minlength=n_families).astype(np.float64)
+    cell_sums = np.stack([np.bincount(codes, weights=values[:, j], minlength=n_families)
+                          for j in range(n_checkpoints)], axis=1)
+    family_sums = cell_sums.sum(axis=1)
+    total_squares = np.square(values).sum()
+
+    ss_runner = (runner_sums ** 2).sum() / n_checkpoints - (family_sums ** 2 / counts).sum() / n_checkpoints
+    ss_residual = (total_squares - (runner_sums ** 2).sum() / n_checkpoints
+                   - (cell_sums ** 2 / counts[:, None]).sum() + (family_sums ** 2 / counts).sum() / n_checkpoints)
+    df_runner = n_runners - n_families
+    df_residual = df_runner * (n_checkpoints - 1)
+    ms_runner = ss_runner / df_runner
+    ms_residual = ss_residual / df_residual
+
+    if ms_runner > ms_residual:
+        scale = ms_residual
+        runner_var = (ms_runner - ms_residual) / n_checkpoints
+    else:
+        # Runner variance on the boundary: REML pools both sums of squares
+        scale = (ss_runner + ss_residual) / (df_runner + df_residual)
+        runner_var = 0.0
+
+    # Fixed effects are a linear map of the cell means: solve the cell design
+    cells = pd.DataFrame({
+        'ShoeFamily': pd.Categorical(np.repeat(family_order, n_checkpoints), categories=family_order),
+        'Distance': pd.Categorical(np.tile(list(checkpoints), n_families), categories=list(checkpoints)),
+    })
+    design = patsy.dmatrix(FORMULA_RHS, cells, return_type='dataframe')
+    cell_means = (cell_sums / counts[:, None]).ravel()
+    inverse = np.linalg.inv(design.to_numpy())
+    params = inverse @ cell_means
+
+    # Cell means of one family share the runner intercepts: compound symmetric covariance
+    block = scale * np.eye(n_checkpoints) + runner_var * np.ones((n_checkpoints, n_checkpoints))
+    cell_cov = np.kron(np.diag(1 / counts), block)
+    param_cov = inverse @ cell_cov @ inverse.T
+
+    # Delta-method standard error of runner_var / scale from the two mean squares
+    ratio = runner_var / scale
+    var_ms_runner = 2 * ms_runner ** 2 / df_runner
+    var_ms_residual = 2 * ms_residual ** 2 / df_residual
+    ratio_se = np.sqrt(var_ms_runner / (n_checkpoints * ms_residual) ** 2
+                       + var_ms_residual * (ms_runner / (n_checkpoints * ms_residual ** 2)) ** 2)
+
+    names = list(design.columns) + ['Group Var']
+    return RandomInterceptResults(
+        params=pd.Series(np.append(params, ratio), index=names),
+        bse=pd.Series(np.append(np.sqrt(np.diag(param_cov)), ratio_se), index=names),
+        scale=float(scale),
+        group_var=float(runner_var),
+        nobs=n_runners * n_checkpoints,
+        ngroups=n_runners,
+    )
+
+
+def input_hash(values: np.ndarray, families: Sequence, checkpoints: Sequence[str],
+               family_order: Optional[List[str]] = None) -> str:
+    """Hash of everything the fit depends on, used as the cache key.
+
+    The module source is hashed along with the inputs, so any change to the
+    fitting code makes earlier cached fits stale.
+    """
+    digest = hashlib.sha256()
+    with open(__file__, 'rb') as f:
+        digest.update(f.read())
+    digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    digest.update('\x00'.join(map(str, families)).encode())
+    digest.update('\x00'.join(checkpoints).encode())
+    digest.update('\x00'.join(family_order or []).encode())
+    return digest.hexdigest()
+
+
+def fit_cached(values: np.ndarray, families: Sequence, checkpoints: Sequence[str],
+               family_order: Optional[List[str]] = None,
+               cache_dir: str = CACHE_DIR) -> RandomInterceptResults:
+    """``fit_random_intercept`` with results kept on disk by input hash."""
+    path = os.path.join(cache_dir, f'{input_hash(values, families, checkpoints, family_order)}.pkl')
+    if os.path.exists(path):
+        logger.info(f"Using cached mixed model fit {path}")
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    results = fit_random_intercept(values, families, checkpoints, family_order)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump(results, f)
+    return results
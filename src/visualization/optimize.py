@@ -1,6 +1,6 @@
 import os
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import pandas as pd
 import numpy as np
@@ -9,6 +9,14 @@ from scipy import stats
 from statsmodels.stats.anova import AnovaRM
 from statsmodels.stats.multicomp import pairwise_tukeyhsd
 import statsmodels.api as sm
+import statsmodels.formula.api as smf
+
+from src.data.label_store import load_labels
+from src.data.race_store import VIEW_METERS, load_view
+from src.features.course import load_course
+from src.visualization.bootstrap import BootstrapBands, bootstrap_curves
+from src.visualization.grouping import GroupCurves, group_curves
+from src.visualization.mixed_model import fit_cached, is_balanced
 
 
 
@@ -17,8 +25,11 @@ INCLUDE_QUESTION_MARKS = False  # Set to True to include "Question Mark" entries
 MINIMUM_RUNNERS = 20
 FIGURE_SIZE = (12, 8)
 SIGNIFICANCE_LEVEL = 0.05
+BOOTSTRAP_RESAMPLES = 2000
+BOOTSTRAP_SEED = 42
 CHECKPOINT_DISTANCES = ['0K', '5K', '10K', '15K', '20K', '25K', '30K', '35K', '40K', 'Finish']  # distances in KM
-CHECKPOINT_METERS = [0,5000,10000,15000,20000,25000,30000,35000,40000,42200]  # convert to meters, marathon is 42.195km
+# Start plus every checkpoint but the half, in metres, from the race store's distance table
+CHECKPOINT_METERS = [0] + [meters for checkpoint, meters in VIEW_METERS.items() if checkpoint != 'HALF']
 
 
 @dataclass
@@ -68,27 +79,24 @@ def fix_percents(data: pd.DataFrame) -> pd.DataFrame:
     #add a column for 0K that is all zeros
     data['0K'] = 0
     #reorder columns
-    data = data[['bib', 'name', '0K', '5K', '10K', '15K', '20K', '25K', '30K', '35K', '40K', 'Finish Net']]
+    data = data[['year', 'bib', 'name', '0K', '5K', '10K', '15K', '20K', '25K', '30K', '35K', '40K', 'Finish Net']]
     return data
 
     
 
-def fix_shoe_choices(data: pd.DataFrame) -> pd.DataFrame:
-    """Fix shoe choices data structure."""
-    data = pd.concat([data, data.loc[[0]]], ignore_index=True)
-    data.columns = ['bib', 'LastName', 'shoeChoice']
-    
+def filter_shoe_choices(data: pd.DataFrame) -> pd.DataFrame:
+    """Drop unidentified shoes unless configured to keep them."""
     # Only filter out Question Marks if configured to do so
     if not INCLUDE_QUESTION_MARKS:
         data = data[~data['shoeChoice'].str.contains('Question Mark')]
     return data
 
 def merge_data(data1: pd.DataFrame, data2: pd.DataFrame) -> pd.DataFrame:
-    """Merge two dataframes on bib number."""
+    """Merge two dataframes on race year and bib number (bibs are reused every year)."""
     merged = pd.merge(
         data1.assign(bib=data1['bib'].astype(str)),
         data2.assign(bib=data2['bib'].astype(str)),
-        on='bib',
+        on=['year', 'bib'],
         how='inner'
     )
     return merged.drop(['LastName', 'name'], axis=1)
@@ -99,20 +107,11 @@ def get_shoe_choices(data: pd.DataFrame) -> np.ndarray:
     logger.info("Shoe choice distribution:\n%s", shoe_counts)
     return data['shoeChoice'].unique()
 
-def calculate_trendline(data: np.ndarray) -> Tuple[float, float]:
-    """Calculate trendline parameters using actual meter distances."""
-    x = np.array(CHECKPOINT_METERS)  # Use actual meter distances
-    return np.polyfit(x, data, 1)
-
 def plot_elevation_profile(ax):
-    #load the elevation data from csv
-    elevation_data = pd.read_csv(r'D:\BAAFootwear\src\visualization\RouteProfile.csv')
-    rename = {'Distance from Start (km)': 'Distance (M)', 'Height Above Sea Level (m)': 'Elevation (M)'}
-    elevation_data = elevation_data.rename(columns=rename)
-    # Convert kilometers to meters in the elevation data
-    elevation_data['Distance (M)'] = elevation_data['Distance (M)'] * 1000
-    ax.plot(elevation_data['Distance (M)'], elevation_data['Elevation (M)'], 'k-', label='Elevation')
-    ax.fill_between(elevation_data['Distance (M)'], elevation_data['Elevation (M)'], color='lightgrey', alpha=0.5)
+    # The course model is built from RouteProfile.csv once per process; draw it unsmoothed
+    course = load_course(smooth_meters=0)
+    ax.plot(course.meters, course.elevation, 'k-', label='Elevation')
+    ax.fill_between(course.meters, course.elevation, color='lightgrey', alpha=0.5)
     ax.set_ylabel('Elevation (M)')
     ax.set_title('Boston Marathon Elevation Profile')
     ax.set_xticks(CHECKPOINT_METERS)
@@ -121,32 +120,22 @@ def plot_elevation_profile(ax):
     ax.grid(True)
 
     
-def plot_shoe_data(data_to_plot: pd.DataFrame, name: str, 
-                   trendline_data: Dict, ax) -> None:
-    """Plot data for a specific shoe or shoe family."""
-    runner_count = len(data_to_plot)
+def plot_shoe_data(name: str, runner_count: int, avg_curve: np.ndarray,
+                   slope: float, intercept: float, ax,
+                   band: Tuple[np.ndarray, np.ndarray] = None) -> None:
+    """Plot the average curve, its confidence band and trendline of a shoe or shoe family."""
     logger.info(f"{name} includes {runner_count} runners")
-    
-    processed_data = data_to_plot.drop(['shoeChoice', 'bib'], axis=1).T.astype(float)
-    avg_curve = processed_data.mean(axis=1)
-    
     x = np.array(CHECKPOINT_METERS)
-    slope, intercept = calculate_trendline(avg_curve.values)
-    
-    trendline_data[name] = {
-        'slope': slope,
-        'intercept': intercept,
-        'std': np.std(processed_data.values),
-        'n': len(processed_data.columns)
-    }
-    
     # Let matplotlib automatically cycle through colors
-    line = ax.plot(x, avg_curve.values, 'o-', label=f'{name} ({runner_count})')
-    # Use the same color for the trendline
+    line = ax.plot(x, avg_curve, 'o-', label=f'{name} ({runner_count})')
+    # Use the same color for the trendline and band
     ax.plot(x, slope * x + intercept, '--', color=line[0].get_color(), alpha=0.5)
+    if band is not None:
+        ax.fill_between(x, band[0], band[1], color=line[0].get_color(), alpha=0.15)
 
-def analyze_data(data: pd.DataFrame, shoe_choices: np.ndarray) -> Dict:
-    """Analyze and visualize shoe performance data."""
+def plot_pace_profile(curves: GroupCurves, bands: Optional[BootstrapBands] = None,
+                      title: str = 'Average Pace Profile Comparison'):
+    """Elevation profile above the pace curves of every group in ``curves``; returns the figure."""
     # Create figure with two subplots sharing x-axis
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10), height_ratios=[1, 3], sharex=True)
     fig.subplots_adjust(hspace=0.1)
@@ -155,41 +144,42 @@ def analyze_data(data: pd.DataFrame, shoe_choices: np.ndarray) -> Dict:
     plot_elevation_profile(ax1)
     
     # Plot speed data on bottom subplot
-    trendline_data = {}
-    processed_shoes = set()
-    plot_index = 0
+    for i, name in enumerate(curves.names):
+        band = None
+        if bands is not None:
+            j = bands.names.index(name)
+            band = (bands.lower[j], bands.upper[j])
+        plot_shoe_data(name, curves.count[i], curves.mean[i], curves.slope[i], curves.intercept[i], ax2,
+                       band=band)
     
-    # Process shoe families
-    for family in SHOE_FAMILIES:
-        family_shoes = [shoe for shoe in shoe_choices 
-                       if any(kw in shoe.lower() for kw in family.keywords)]
-        if not family_shoes:
-            continue
-            
-        family_data = pd.concat([data[data['shoeChoice'] == shoe] 
-                               for shoe in family_shoes])
-        processed_shoes.update(family_shoes)
-        
-        if len(family_data) >= MINIMUM_RUNNERS:
-            plot_shoe_data(family_data, family.name, trendline_data, ax2)
-            plot_index += 1
+    configure_plot(ax2, title)
+    return fig
+
+def analyze_data(data: pd.DataFrame) -> Dict:
+    """Analyze and visualize shoe performance data."""
+    # Families first, then shoes that belong to no family, all in one grouped pass
+    checkpoints = [c for c in data.columns if c not in ('shoeChoice', 'bib', 'year')]
+    families = {family.name: family.keywords for family in SHOE_FAMILIES}
+    curves = group_curves(data, checkpoints, CHECKPOINT_METERS, families)
+    curves = curves.select(curves.count >= MINIMUM_RUNNERS)
     
-    # Process remaining individual shoes
-    for shoe in shoe_choices:
-        if shoe not in processed_shoes:
-            shoe_data = data[data['shoeChoice'] == shoe]
-            if len(shoe_data) >= MINIMUM_RUNNERS:
-                plot_shoe_data(shoe_data, shoe, trendline_data, ax2)
-                plot_index += 1
+    # 95% bootstrap intervals for each plotted curve and slope
+    bands = bootstrap_curves(data, checkpoints, CHECKPOINT_METERS, families, groups=curves.names,
+                             resamples=BOOTSTRAP_RESAMPLES, seed=BOOTSTRAP_SEED)
+    bands.export()
     
-    configure_plot(ax2)
+    plot_pace_profile(curves, bands)
     # plt.tight_layout()
     plt.show()
+    
+    trendline_data = curves.trendlines()
+    for i, name in enumerate(bands.names):
+        trendline_data[name]['slope_ci'] = (float(bands.slope_lower[i]), float(bands.slope_upper[i]))
     return trendline_data
 
-def configure_plot(ax) -> None:
+def configure_plot(ax, title: str = 'Average Pace Profile Comparison') -> None:
     """Configure plot parameters."""
-    ax.set_title('Average Pace Profile Comparison')
+    ax.set_title(title)
     ax.set_xlabel('Distance (m)')
     ax.set_ylabel('Percent Pace Change')
     ax.set_xlim(-500, 42700)
@@ -202,7 +192,8 @@ def configure_plot(ax) -> None:
 # --- New LMM Function ---
 def run_linear_mixed_model(data_for_analysis: pd.DataFrame,
                            checkpoint_cols: List[str],
-                           ref_family: str = None):
+                           ref_family: str = None,
+                           fast: bool = True):
     """
     Performs a Linear Mixed-Effects Model analysis on pace change data.
 
@@ -211,11 +202,13 @@ def run_linear_mixed_model(data_for_analysis: pd.DataFrame,
                            'ShoeFamily', and checkpoint pace columns. Should already
                            be filtered for families meeting minimum runner count.
         checkpoint_cols: List of column names representing pace change at checkpoints.
-        ref_family: Optional name of the shoe family to use as the reference level
-                    for comparisons in the model summary. If None, statsmodels picks one.
+        ref_family: Optional name of the shoe family to list first among the
+                    ShoeFamily levels. If None, levels are sorted.
+        fast: When every runner has every checkpoint, fit from per-runner sums
+              (src.visualization.mixed_model, cached by input) instead of statsmodels.
 
     Returns:
-        Fitted MixedLMResults object, or None if analysis fails.
+        Fitted MixedLMResults (or RandomInterceptResults on the fast path), or None if analysis fails.
     """
     logger.info("--- Starting Linear Mixed-Effects Model Analysis ---")
 
@@ -223,9 +216,28 @@ def run_linear_mixed_model(data_for_analysis: pd.DataFrame,
         logger.error("Input data for LMM is empty. Skipping analysis.")
         return None
 
+    families = sorted(data_for_analysis['ShoeFamily'].unique())
+    if ref_family and ref_family in families:
+        logger.info(f"Listing '{ref_family}' first among the ShoeFamily levels.")
+        families = [ref_family] + [f for f in families if f != ref_family]
+    elif ref_family:
+        logger.warning(f"Reference family '{ref_family}' not found in data. Using default order.")
+
+    value_vars = [col for col in checkpoint_cols if col in data_for_analysis.columns]
+    values = data_for_analysis[value_vars].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    if fast and is_balanced(values):
+        # Same model and REML estimates as below, without the long table
+        results = fit_cached(values, data_for_analysis['ShoeFamily'].to_numpy(), value_vars, families)
+        logger.info("\n--- LMM Results Summary ---")
+        print(results.summary())
+        logger.info("--- End of LMM Results Summary ---")
+        return results
+
     # 1. Reshape data from wide to long format
     try:
         id_vars = ['bib', 'ShoeFamily'] # Add other relevant runner-level vars if needed
+        if 'year' in data_for_analysis.columns:
+            id_vars = ['year'] + id_vars
         value_vars = [col for col in checkpoint_cols if col in data_for_analysis.columns]
         if not value_vars:
              logger.error("No valid checkpoint columns found in the data for melting.")
@@ -256,18 +268,8 @@ def run_linear_mixed_model(data_for_analysis: pd.DataFrame,
         distance_cat_type = pd.CategoricalDtype(categories=value_vars, ordered=True)
         long_data['Distance'] = long_data['Distance'].astype(distance_cat_type)
 
-        # Ensure ShoeFamily is categorical, potentially setting reference level
-        families = long_data['ShoeFamily'].unique()
-        if ref_family and ref_family in families:
-             logger.info(f"Setting '{ref_family}' as the reference category for ShoeFamily.")
-             # Use patsy's Treatment contrast to set the reference level
-             long_data['ShoeFamily'] = pd.Categorical(long_data['ShoeFamily'])
-             long_data['ShoeFamily'] = Treatment(reference=families.tolist().index(ref_family)).code_without_intercept(long_data['ShoeFamily'].cat.categories.tolist())[long_data['ShoeFamily'].cat.codes]
-
-        else:
-             if ref_family:
-                  logger.warning(f"Reference family '{ref_family}' not found in data. Using default reference.")
-             long_data['ShoeFamily'] = long_data['ShoeFamily'].astype('category')
+        # Ensure ShoeFamily is categorical, in the level order chosen above
+        long_data['ShoeFamily'] = pd.Categorical(long_data['ShoeFamily'], categories=families)
 
 
     except Exception as e:
@@ -286,8 +288,13 @@ def run_linear_mixed_model(data_for_analysis: pd.DataFrame,
         logger.info(f"Fitting LMM with formula: {formula}")
         logger.info(f"Grouping variable: bib")
 
+        # Bibs are reused every year, so a runner is a year and bib pair
+        runner = long_data["bib"].astype(str)
+        if 'year' in long_data.columns:
+            runner = long_data["year"].astype(str) + '/' + runner
+
         # Instantiate the model
-        model = smf.mixedlm(formula, data=long_data, groups=long_data["bib"])
+        model = smf.mixedlm(formula, data=long_data, groups=runner)
 
         # Fit the model (REML is default and generally preferred for variance components)
         results = model.fit(reml=True)
@@ -311,15 +318,17 @@ def run_linear_mixed_model(data_for_analysis: pd.DataFrame,
 def main():
     """Main execution function."""
     try:
-        shoe_choice = load_data(r'D:\BAAFootwear\data\Raw\ShoeChoices.csv')
-        speed = load_data(r'D:\BAAFootwear\data\Raw\KMH_percent_noHalf.csv')
+        shoe_choice = load_labels()
+        # Only read the editions that have labels, leaving out runners whose
+        # splits failed the quality screen
+        speed = load_view('percent', usable_only=True, years=shoe_choice['year'].unique())
         
         speed = fix_percents(speed)
-        shoe_choice = fix_shoe_choices(shoe_choice)
+        shoe_choice = filter_shoe_choices(shoe_choice)
         data = merge_data(shoe_choice, speed)
-        shoe_choices = get_shoe_choices(data)
+        get_shoe_choices(data)
         
-        trendline_data = analyze_data(data, shoe_choices)
+        trendline_data = analyze_data(data)
 
     except Exception as e:
         logger.error("An error occurred: %s", str(e))
@@ -0,0 +1,123 @@
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from statsmodels.stats.multitest import multipletests
+
+from src.visualization.grouping import shoe_groups
+
+
+logger = logging.getLogger(__name__)
+
+PERMUTATIONS = 10000
+# Permutations drawn per batch, each batch with its own child seed
+BATCH_SIZE = 250
+# 'maxT' is the Westfall-Young step of comparing every pair against the largest
+# difference of each permutation; the rest are passed to statsmodels' multipletests
+CORRECTIONS = ['maxT', 'holm', 'bonferroni', 'fdr_bh']
+
+
+def runner_slopes(values: np.ndarray, x: Sequence[float]) -> np.ndarray:
+    """Least-squares slope of every runner's curve against ``x`` as one matrix product.
+
+    The slope of a group's mean curve equals the mean of its runners'
+    slopes, so refitting a group is just averaging these.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    weights = (x - x.mean()) / ((x - x.mean()) ** 2).sum()
+    return values @ weights
+
+
+def _permuted_differences(slopes: np.ndarray, codes: np.ndarray, n_groups: int,
+                          pairs: np.ndarray, sizes: Sequence[int],
+                          seeds: Sequence[np.random.SeedSequence]) -> np.ndarray:
+    """Absolute slope differences of every pair for each permutation of the group codes."""
+    counts = np.bincount(codes, minlength=n_groups)
+    out = []
+    for size, seed in zip(sizes, seeds):
+        rng = np.random.default_rng(seed)
+        shuffled = rng.permuted(np.broadcast_to(codes, (size, len(codes))), axis=1)
+        shuffled += np.arange(size)[:, None] * n_groups
+        sums = np.bincount(shuffled.ravel(), weights=np.tile(slopes, size), minlength=size * n_groups)
+        group_slopes = sums.reshape(size, n_groups) / counts
+        out.append(np.abs(group_slopes[:, pairs[:, 0]] - group_slopes[:, pairs[:, 1]]))
+    return np.concatenate(out)
+
+
+def compare_slopes(data: pd.DataFrame, checkpoints: Sequence[str], x: Sequence[float],
+                   families: Dict[str, Sequence[str]], groups: Optional[Sequence[str]] = None,
+                   permutations: int = PERMUTATIONS, correction: str = 'maxT', alpha: float = 0.05,
+                   seed: int = 0, workers: int = 1, shoe_column: str = 'shoeChoice') -> pd.DataFrame:
+    """Permutation test of the trendline slope difference of every pair of groups.
+
+    The group labels of the runners in ``groups`` are shuffled together and
+    every group's slope is refit for each shuffle at once, so one set of
+    permutations serves all pairs.
+
+    Args:
+        data: One row per runner with a shoe column and complete checkpoint columns.
+        checkpoints: Checkpoint columns to use, in order.
+        x: Position of each checkpoint on the trendline's x axis.
+        families: Family name -> keywords, as in ``group_curves``.
+        groups: Groups to compare; all groups when None.
+        permutations: Number of label shuffles.
+        correction: Multiple-comparison correction, one of CORRECTIONS.
+        alpha: Family-wise (or false discovery) rate for ``significant``.
+        seed: Seed for reproducible p-values.
+        workers: Processes to spread the permutations over; 1 runs in-process.
+
+    Returns:
+        One row per pair with both slopes, their difference, the raw and
+        adjusted p-values and whether the difference is significant.
+    """
+    if correction not in CORRECTIONS:
+        raise ValueError(f"Unknown correction '{correction}', expected one of {CORRECTIONS}")
+    codes, names, _ = shoe_groups(data[shoe_column], families)
+    wanted = list(groups) if groups is not None else names
+    # Renumber the wanted groups 0..k-1 and leave everyone else out
+    remap = np.full(len(names), -1)
+    remap[[names.index(name) for name in wanted]] = np.arange(len(wanted))
+    codes = remap[codes]
+    keep = codes >= 0
+    codes = codes[keep]
+    slopes = runner_slopes(data.loc[keep, list(checkpoints)].to_numpy(dtype=np.float64), x)
+
+    n_groups = len(wanted)
+    pairs = np.array(list(itertools.combinations(range(n_groups), 2)), dtype=np.intp).reshape(-1, 2)
+    observed_slopes = np.bincount(codes, weights=slopes, minlength=n_groups) / np.bincount(codes, minlength=n_groups)
+    observed = np.abs(observed_slopes[pairs[:, 0]] - observed_slopes[pairs[:, 1]])
+
+    sizes = [min(BATCH_SIZE, permutations - start) for start in range(0, permutations, BATCH_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers > 1:
+        splits = [split for split in np.array_split(np.arange(len(sizes)), workers) if len(split)]
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_permuted_differences, slopes, codes, n_groups, pairs,
+                                   [sizes[i] for i in split], [seeds[i] for i in split])
+                       for split in splits]
+            permuted = np.concatenate([f.result() for f in futures])
+    else:
+        permuted = _permuted_differences(slopes, codes, n_groups, pairs, sizes, seeds)
+
+    # Add one to both counts so a p-value is never exactly zero
+    p_values = (1 + (permuted >= observed).sum(axis=0)) / (permutations + 1)
+    if correction == 'maxT':
+        # Single-step maxT: compare each pair with the largest difference in each permutation
+        largest = permuted.max(axis=1)
+        adjusted = (1 + (largest[:, None] >= observed).sum(axis=0)) / (permutations + 1)
+    else:
+        adjusted = multipletests(p_values, alpha=alpha, method=correction)[1]
+
+    return pd.DataFrame({
+        'group1': [wanted[i] for i in pairs[:, 0]],
+        'group2': [wanted[j] for j in pairs[:, 1]],
+        'slope1': observed_slopes[pairs[:, 0]],
+        'slope2': observed_slopes[pairs[:, 1]],
+        'difference': observed_slopes[pairs[:, 0]] - observed_slopes[pairs[:, 1]],
+        'p_value': p_values,
+        'p_adjusted': adjusted,
+        'significant': adjusted < alpha,
+    })
@@ -0,0 +1,362 @@
+import matplotlib
+# Render without a display; must be chosen before pyplot is imported
+matplotlib.use('Agg')
+
+import argparse
+import dataclasses
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from src.data.label_store import load_labels
+from src.data.race_store import VIEW_METERS, load_seconds, load_view
+from src.features.segment_speed import segment_features
+from src.visualization import optimize
+from src.visualization.bootstrap import REPORTS_DIR, BootstrapBands, bootstrap_curves
+from src.visualization.grouping import GroupCurves, group_curves, shoe_groups
+from src.visualization.mixed_model import fit_cached
+from src.visualization.permutation import compare_slopes, runner_slopes
+
+
+logger = logging.getLogger(__name__)
+
+# Input hash of every output written so far, kept next to the outputs
+MANIFEST_NAME = '.report_manifest.json'
+DPI = 150
+# Segment speeds in the boxplot; the half split is left out as in buildKMH
+BOXPLOT_CHECKPOINTS = [checkpoint for checkpoint in VIEW_METERS if checkpoint != 'HALF']
+
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Code the figure jobs run: the plotting and statistics modules, the feature
+# builders and the store loader. Editing any of them re-renders everything.
+CODE_SOURCES = sorted(
+    glob.glob(os.path.join(_SRC_DIR, 'visualization', '*.py'))
+    + glob.glob(os.path.join(_SRC_DIR, 'features', '*.py'))
+    + [os.path.join(_SRC_DIR, 'data', 'race_store.py')]
+)
+
+
+@dataclass
+class ReportJob:
+    """One output file and the module-level function that renders it from ``args``.
+
+    ``render(path, *args)`` runs in a worker process, so the function and
+    its arguments must be picklable. The job is skipped when the hash of
+    its arguments matches the one recorded for the existing file.
+    """
+    output: str
+    render: Callable[..., None]
+    args: Tuple
+
+
+class Deferred:
+    """A job argument that is slow to compute, such as the bootstrap bands.
+
+    It is hashed by ``key``, a digest of what it is computed from, so
+    outputs whose inputs are unchanged are skipped without computing it.
+    ``value()`` runs ``compute`` once, in the parent, when the first job
+    that needs it is rendered.
+    """
+
+    def __init__(self, key: str, compute: Callable[[], object]):
+        self.key = key
+        self._compute = compute
+        self._value = None
+        self._computed = False
+
+    def value(self):
+        if not self._computed:
+            self._value = self._compute()
+            self._computed = True
+        return self._value
+
+
+def _update_digest(digest, value) -> None:
+    """Feed ``value`` into ``digest`` by content, recursing into containers and dataclasses."""
+    if isinstance(value, Deferred):
+        digest.update(value.key.encode())
+    elif isinstance(value, pd.DataFrame):
+        digest.update('\x00'.join(map(str, value.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(str(value.dtype).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif dataclasses.is_dataclass(value):
+        for field in dataclasses.fields(value):
+            _update_digest(digest, getattr(value, field.name))
+    elif isinstance(value, dict):
+        for key in sorted(value):
+            digest.update(repr(key).encode())
+            _update_digest(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _update_digest(digest, item)
+    else:
+        digest.update(repr(value).encode())
+    digest.update(b'\x01')
+
+
+@lru_cache(maxsize=None)
+def code_hash() -> str:
+    """Hash of every module in ``CODE_SOURCES``, read once per run."""
+    digest = hashlib.sha256()
+    for source in CODE_SOURCES:
+        digest.update(os.path.relpath(source, _SRC_DIR).encode())
+        with open(source, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _digest_of(value) -> str:
+    digest = hashlib.sha256()
+    _update_digest(digest, value)
+    return digest.hexdigest()
+
+
+def job_hash(job: ReportJob) -> str:
+    """Hash of the job's inputs and of the code that draws it."""
+    digest = hashlib.sha256()
+    digest.update(code_hash().encode())
+    digest.update(job.render.__name__.encode())
+    _update_digest(digest, job.args)
+    return digest.hexdigest()
+
+
+def _save_figure(fig, path: str) -> None:
+    fig.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+
+
+def render_pace_profile(path: str, curves: GroupCurves, bands: BootstrapBands) -> None:
+    """Elevation profile above every group's pace curve, band and trendline."""
+    _save_figure(optimize.plot_pace_profile(curves, bands), path)
+
+
+def render_group_profile(path: str, curves: GroupCurves, bands: BootstrapBands) -> None:
+    """The elevation and pace figure for a single group."""
+    name = curves.names[0]
+    _save_figure(optimize.plot_pace_profile(curves, bands, title=f'Pace Profile: {name}'), path)
+
+
+def render_adjusted_profile(path: str, curves: GroupCurves) -> None:
+    """The pace profile figure drawn from grade-adjusted pace changes."""
+    _save_figure(optimize.plot_pace_profile(curves, title='Grade-Adjusted Pace Profile Comparison'), path)
+
+
+def render_speed_boxplot(path: str, seconds: pd.DataFrame) -> None:
+    """Segment speed (m/s) of every usable runner at each checkpoint."""
+    features = segment_features(seconds[BOXPLOT_CHECKPOINTS].to_numpy(),
+                                [VIEW_METERS[c] for c in BOXPLOT_CHECKPOINTS], BOXPLOT_CHECKPOINTS)
+    speed = features.speed('mps')
+    fig, ax = plt.subplots(figsize=optimize.FIGURE_SIZE)
+    ax.boxplot([column[~np.isnan(column)] for column in speed.T], showfliers=False)
+    ax.set_xticks(np.arange(1, len(BOXPLOT_CHECKPOINTS) + 1), BOXPLOT_CHECKPOINTS)
+    ax.set_title(f'Segment Speed of {len(seconds)} Runners')
+    ax.set_xlabel('Checkpoint')
+    ax.set_ylabel('Speed (m/s)')
+    ax.grid(True)
+    _save_figure(fig, path)
+
+
+def render_slope_boxplot(path: str, data: pd.DataFrame, checkpoints: Sequence[str],
+                         families: Dict[str, Sequence[str]], groups: List[str]) -> None:
+    """Spread of the runners' own trendline slopes within each plotted group."""
+    codes, names, _ = shoe_groups(data['shoeChoice'], families)
+    slopes = runner_slopes(data[list(checkpoints)].to_numpy(dtype=np.float64), optimize.CHECKPOINT_METERS)
+    fig, ax = plt.subplots(figsize=optimize.FIGURE_SIZE)
+    ax.boxplot([slopes[codes == names.index(name)] for name in groups], showfliers=False)
+    ax.set_xticks(np.arange(1, len(groups) + 1), groups, rotation=30, ha='right')
+    ax.set_title('Runner Trendline Slopes by Shoe')
+    ax.set_ylabel('Percent Pace Change per Meter')
+    ax.grid(True)
+    _save_figure(fig, path)
+
+
+def write_trendlines(path: str, curves: GroupCurves, bands: BootstrapBands) -> None:
+    """Slope, intercept, spread, runner count and slope interval of every group."""
+    table = pd.DataFrame.from_dict(curves.trendlines(), orient='index').rename_axis('group').reset_index()
+    table['slope_lower'] = bands.slope_lower
+    table['slope_upper'] = bands.slope_upper
+    table.to_csv(path, index=False)
+
+
+def write_bands(path: str, bands: BootstrapBands) -> None:
+    """Bootstrap interval of every group's mean curve at each checkpoint."""
+    bands.curves_frame().to_csv(path, index=False)
+
+
+def write_slope_comparisons(path: str, data: pd.DataFrame, checkpoints: Sequence[str],
+                            families: Dict[str, Sequence[str]], groups: List[str]) -> None:
+    """Permutation test of the slope difference of every pair of groups."""
+    compare_slopes(data, checkpoints, optimize.CHECKPOINT_METERS, families, groups=groups,
+                   seed=optimize.BOOTSTRAP_SEED).to_csv(path, index=False)
+
+
+def write_mixed_model(path: str, data: pd.DataFrame, checkpoints: Sequence[str],
+                      families: Dict[str, Sequence[str]], groups: List[str]) -> None:
+    """Summary of the family x distance random-intercept model of the plotted groups."""
+    codes, names, _ = shoe_groups(data['shoeChoice'], families)
+    group_names = np.array(names, dtype=object)[codes]
+    keep = np.isin(group_names, groups)
+    results = fit_cached(data.loc[keep, list(checkpoints)].to_numpy(dtype=np.float64),
+                         group_names[keep], list(checkpoints), sorted(groups))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(results.summary() + '\n')
+
+
+def _slug(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+def _run_job(job: ReportJob, out_dir: str) -> str:
+    # Write next to the target and rename, so an interrupted run never leaves a partial file
+    path = os.path.join(out_dir, job.output)
+    root, ext = os.path.splitext(path)
+    tmp_path = f'{root}.{os.getpid()}.tmp{ext}'
+    job.render(tmp_path, *job.args)
+    os.replace(tmp_path, path)
+    return job.output
+
+
+def build_jobs(data: pd.DataFrame, seconds: pd.DataFrame,
+               adjusted: Optional[pd.DataFrame] = None) -> List[ReportJob]:
+    """Every figure and table of the report.
+
+    Group curves are computed once here and handed to the jobs that draw
+    them; the slower statistics run inside their job. The bootstrap bands
+    are shared by several jobs, so they are passed as a ``Deferred`` keyed
+    on each group's runners. They are only computed if one of those jobs
+    has to be rendered.
+
+    Args:
+        data: Labelled runners as built by ``optimize.main`` (shoeChoice and
+              percent pace change columns).
+        seconds: Usable split seconds of all runners, for the speed boxplot.
+        adjusted: ``data`` with grade-adjusted pace changes instead, for a
+                  second profile with the course's hills taken out.
+    """
+    checkpoints = [c for c in data.columns if c not in ('shoeChoice', 'bib', 'year')]
+    families = {family.name: family.keywords for family in optimize.SHOE_FAMILIES}
+    curves = group_curves(data, checkpoints, optimize.CHECKPOINT_METERS, families)
+    curves = curves.select(curves.count >= optimize.MINIMUM_RUNNERS)
+
+    # A group's band depends on its own runners, its position (which picks
+    # its seed) and the bootstrap settings, not on the other groups
+    codes, names, _ = shoe_groups(data['shoeChoice'], families)
+    values = data[checkpoints].to_numpy(dtype=np.float64)
+    settings = (checkpoints, optimize.CHECKPOINT_METERS, optimize.BOOTSTRAP_RESAMPLES, optimize.BOOTSTRAP_SEED)
+    group_keys = [_digest_of((name, names.index(name), values[codes == names.index(name)], settings))
+                  for name in curves.names]
+    bands = Deferred(_digest_of(group_keys), lambda: bootstrap_curves(
+        data, checkpoints, optimize.CHECKPOINT_METERS, families, groups=curves.names,
+        resamples=optimize.BOOTSTRAP_RESAMPLES, seed=optimize.BOOTSTRAP_SEED))
+    # The first checkpoint is the 0K baseline, which is zero for everyone
+    model_checkpoints = [c for c in checkpoints if c != '0K']
+
+    jobs = [
+        ReportJob('pace_profile.png', render_pace_profile, (curves, bands)),
+        ReportJob('speed_boxplot.png', render_speed_boxplot, (seconds,)),
+        ReportJob('slope_boxplot.png', render_slope_boxplot, (data, checkpoints, families, curves.names)),
+        ReportJob('trendlines.csv', write_trendlines, (curves, bands)),
+        ReportJob('bootstrap_bands.csv', write_bands, (bands,)),
+        ReportJob('slope_comparisons.csv', write_slope_comparisons, (data, checkpoints, families, curves.names)),
+        ReportJob('mixed_model.txt', write_mixed_model, (data, model_checkpoints, families, curves.names)),
+    ]
+    if adjusted is not None:
+        adjusted_curves = group_curves(adjusted, checkpoints, optimize.CHECKPOINT_METERS, families)
+        adjusted_curves = adjusted_curves.select(np.isin(adjusted_curves.names, curves.names))
+        jobs.append(ReportJob('grade_adjusted_profile.png', render_adjusted_profile, (adjusted_curves,)))
+    for i, name in enumerate(curves.names):
+        # Each group's figure only depends on that group's curve and band
+        one = np.arange(len(curves.names)) == i
+        group_bands = Deferred(group_keys[i], lambda one=one: bands.value().select(one))
+        jobs.append(ReportJob(f'profile_{_slug(name)}.png', render_group_profile,
+                              (curves.select(one), group_bands)))
+    return jobs
+
+
+def render_report(jobs: Sequence[ReportJob], out_dir: str = REPORTS_DIR, workers: Optional[int] = None,
+                  force: bool = False) -> Dict[str, str]:
+    """Render the jobs whose inputs changed since the last run, in parallel.
+
+    Returns:
+        Output name -> 'rendered', 'unchanged' or 'failed'.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    status = {}
+    todo = []
+    for job in jobs:
+        key = job_hash(job)
+        if not force and manifest.get(job.output) == key and os.path.exists(os.path.join(out_dir, job.output)):
+            status[job.output] = 'unchanged'
+        else:
+            todo.append((job, key))
+    logger.info(f"{len(todo)} of {len(jobs)} report outputs to render")
+
+    if todo:
+        # Compute the deferred arguments of the jobs that do run
+        todo = [(dataclasses.replace(job, args=tuple(arg.value() if isinstance(arg, Deferred) else arg
+                                                     for arg in job.args)), key)
+                for job, key in todo]
+        with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+            futures = [(pool.submit(_run_job, job, out_dir), job, key) for job, key in todo]
+            for future, job, key in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Rendering {job.output} failed: {e}")
+                    manifest.pop(job.output, None)
+                    status[job.output] = 'failed'
+                else:
+                    manifest[job.output] = key
+                    status[job.output] = 'rendered'
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render the shoe analysis figures and tables without a display.')
+    parser.add_argument('--out', default=REPORTS_DIR, help='Directory the report is written to')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes; defaults to the CPU count')
+    parser.add_argument('--force', action='store_true', help='Render every output even if its inputs are unchanged')
+    args = parser.parse_args()
+
+    labels = optimize.filter_shoe_choices(load_labels())
+    years = labels['year'].unique()
+    speed = optimize.fix_percents(load_view('percent', usable_only=True, years=years))
+    data = optimize.merge_data(labels, speed)
+    adjusted_speed = optimize.fix_percents(load_view('gap_percent', usable_only=True, years=years))
+    adjusted = optimize.merge_data(labels, adjusted_speed)
+    seconds = load_seconds(columns=BOXPLOT_CHECKPOINTS, usable_only=True, years=years)
+
+    status = render_report(build_jobs(data, seconds, adjusted), args.out, args.workers, args.force)
+    counts = pd.Series(status).value_counts().to_dict()
+    logger.info(f"Report in {args.out}: {counts}")
+    if 'failed' in counts:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -2,7 +2,11 @@ import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy import stats
+
+from src.data.label_store import load_labels
+from src.data.race_store import VIEW_METERS, load_view
+from src.visualization.grouping import group_curves
+from src.visualization.permutation import compare_slopes
 
 
 
@@ -11,17 +15,11 @@ def load_data(data_path):
     data = pd.read_csv(data_path, encoding='latin1')  # Specify correct encoding
     return data
 
-def fix_shoeChoices(data):
-    # Add a row for the header using pd.concat
-    data = pd.concat([data, data.loc[[0]]], ignore_index=True)
-    # Rename the columns
-    data.columns = ['bib', 'LastName', 'shoeChoice']
-    return data
-
 def merge_data(data1, data2):
     data1['bib'] = data1['bib'].astype(str)  # Convert 'bib' to string
     data2['bib'] = data2['bib'].astype(str)
-    data = pd.merge(data1, data2, on='bib', how='inner')
+    # Bibs are reused every year, so match on the race year too
+    data = pd.merge(data1, data2, on=['year', 'bib'], how='inner')
     #drop name columns 
     data = data.drop(['LastName'], axis=1)
     data = data.drop(['name'], axis=1)
@@ -40,41 +38,25 @@ def get_shoeChoices(data):
 def fit_data(data, shoeChoices):
     # Define shoe families using keywords
     shoe_families = {
-        'Adios': [shoe for shoe in shoeChoices if 'adios' in shoe.lower()],
-        'Vaporfly': [shoe for shoe in shoeChoices if 'vaporfly' in shoe.lower()],
-        'Alphafly': [shoe for shoe in shoeChoices if 'alphafly' in shoe.lower()],
+        'Adios': ['adios'],
+        'Vaporfly': ['vaporfly'],
+        'Alphafly': ['alphafly'],
     }
     
     plt.figure(figsize=(12, 8))
     colors = ['b', 'g', 'r', 'c', 'm', 'y', 'k', '#FFA500', '#800080', '#008080']  # Extended color list
-    trendline_data = {}
     
-    # Track processed shoes to avoid duplicates
-    processed_shoes = set()
-    plot_index = 0
+    # Group every runner into a family or its own shoe and reduce them all at once,
+    # with the splits placed at their distance in KM
+    checkpoints = [c for c in data.columns if c not in ('shoeChoice', 'bib', 'year')]
+    x_km = np.array([VIEW_METERS[c] / 1000 for c in checkpoints])
+    curves = group_curves(data, checkpoints, x_km, shoe_families)
+    curves = curves.select(np.where(curves.is_family, curves.count > 4, curves.count > 3))
     
-    # First process shoe families
-    for family_name, family_shoes in shoe_families.items():
-        if not family_shoes:
-            continue
-            
-        family_data = pd.DataFrame()
-        for shoe in family_shoes:
-            shoe_data = data[data['shoeChoice'] == shoe]
-            family_data = pd.concat([family_data, shoe_data])
-            processed_shoes.add(shoe)
-        
-        if len(family_data) > 4:
-            plot_data(family_data, family_name, colors[plot_index % len(colors)], trendline_data)
-            plot_index += 1
-            
-    # Then process individual shoes not in families
-    for shoe in shoeChoices:
-        if shoe not in processed_shoes:
-            shoe_data = data[data['shoeChoice'] == shoe]
-            if len(shoe_data) > 3:
-                plot_data(shoe_data, shoe, colors[plot_index % len(colors)], trendline_data)
-                plot_index += 1
+    for plot_index, name in enumerate(curves.names):
+        plot_data(name, curves.count[plot_index], x_km, curves.mean[plot_index],
+                  curves.slope[plot_index], curves.intercept[plot_index], colors[plot_index % len(colors)])
+    trendline_data = curves.trendlines()
     
     plt.title('Average Pace Profile Comparison')
     plt.xlabel('Mile')
@@ -85,74 +67,35 @@ def fit_data(data, shoeChoices):
     plt.show()
     
     # Perform statistical comparison of trendlines
-    compare_trendlines(trendline_data)
+    compare_trendlines(data, checkpoints, x_km, shoe_families, curves.names)
     
     return trendline_data
 
-def plot_data(data_to_plot, name, color, trendline_data):
-    runner_count = len(data_to_plot)
+def plot_data(name, runner_count, x_numeric, avg_curve, m, b, color):
     print(f"\n{name} includes {runner_count} runners")
     
-    # Process the data
-    processed_data = data_to_plot.drop(['shoeChoice', 'bib'], axis=1)
-    processed_data = processed_data.T
-    processed_data = processed_data[1:]  # Remove header row
-    processed_data = processed_data.astype(float)
-    
-    # Use the original index (splits in KM) for the x-axis
-    split_labels = processed_data.index
-    # Helper function to extract a float from a string label
-    def extract_float(x):
-        import re
-        match = re.search(r'[\d.]+', str(x))
-        return float(match.group()) if match else np.nan
-    
-    x_numeric = split_labels.map(extract_float)
-    
-    # Compute average curve and trendline
-    avg_curve = processed_data.mean(axis=1)
-    m, b = np.polyfit(x_numeric, avg_curve.values, 1)
-    
-    # Store trendline data
-    trendline_data[name] = {
-        'slope': m, 
-        'intercept': b,
-        'std': np.std(processed_data.values),
-        'n': len(processed_data.columns)
-    }
-    
     # Plot using x_numeric so the x-axis shows original KM splits
-    plt.plot(x_numeric, avg_curve.values, f'{color}o-', label=f'{name} ({runner_count})')
-    plt.plot(x_numeric, m * x_numeric + b, f'{color}--', alpha=0.5)
+    plt.plot(x_numeric, avg_curve, 'o-', color=color, label=f'{name} ({runner_count})')
+    plt.plot(x_numeric, m * x_numeric + b, '--', color=color, alpha=0.5)
 
-def compare_trendlines(trendline_data):
-    if len(trendline_data) >= 2:
-        names = list(trendline_data.keys())
-        for i in range(len(names)):
-            for j in range(i + 1, len(names)):
-                name1, name2 = names[i], names[j]
-                data1, data2 = trendline_data[name1], trendline_data[name2]
-                
-                t_statistic, p_value = stats.ttest_ind_from_stats(
-                    mean1=data1['slope'], std1=data1['std'], nobs1=data1['n'],
-                    mean2=data2['slope'], std2=data2['std'], nobs2=data2['n'],
-                    equal_var=False
-                )
-                
-                print(f"\nComparing {name1} and {name2}:")
-                print(f"T-statistic: {t_statistic:.3f}, P-value: {p_value:.3f}")
-                if p_value < 0.05:
-                    print("THE SLOPES ARE SIGNIFICANTLY DIFFERENT.")
-                else:
-                    print("The slopes are not significantly different.")
+def compare_trendlines(data, checkpoints, x, shoe_families, names):
+    if len(names) >= 2:
+        # Permutation test on the slopes with a family-wise error correction over all pairs
+        results = compare_slopes(data, checkpoints, x, shoe_families, groups=names, seed=0)
+        for row in results.itertuples():
+            print(f"\nComparing {row.group1} and {row.group2}:")
+            print(f"Slope difference: {row.difference:.5f}, P-value: {row.p_value:.4f}, "
+                  f"adjusted P-value: {row.p_adjusted:.4f}")
+            if row.significant:
+                print("THE SLOPES ARE SIGNIFICANTLY DIFFERENT.")
+            else:
+                print("The slopes are not significantly different.")
     else:
         print("\nNot enough groups to perform statistical comparison.")
 
 
-shoeChoice = load_data(r'D:\BAAFootwear\data\Raw\ShoeChoices.csv')
-speed = load_data(r'D:\BAAFootwear\data\Raw\KMH.csv')
-
-shoeChoice = fix_shoeChoices(shoeChoice)
+shoeChoice = load_labels()
+speed = load_view('seconds', include_half=True, usable_only=True, years=shoeChoice['year'].unique())
 
 data = merge_data(shoeChoice, speed)
 
@@ -0,0 +1,117 @@
+import asyncio
+import gzip
+import time
+
+import pytest
+from aiohttp import web
+
+from src.data.crawler import AsyncFetcher, FetchConfig, FetchError
+
+
+CONCURRENCY = 3
+
+
+class StandInServer:
+    """Local stand-in for results.baa.org with one route per behaviour under test."""
+
+    def __init__(self):
+        self.calls = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.app = web.Application()
+        self.app.router.add_get('/missing', self.missing)
+        self.app.router.add_get('/busy', self.busy)
+        self.app.router.add_get('/forbidden', self.forbidden)
+        self.app.router.add_get('/gzip', self.gzipped)
+        self.app.router.add_get('/slow/{n}', self.slow)
+
+    def _count(self, request) -> int:
+        self.calls[request.path] = self.calls.get(request.path, 0) + 1
+        return self.calls[request.path]
+
+    async def missing(self, request):
+        self._count(request)
+        return web.Response(status=404)
+
+    async def busy(self, request):
+        # Unavailable on the first request, fine after that
+        if self._count(request) == 1:
+            return web.Response(status=503, headers={'Retry-After': '1'})
+        return web.Response(text='<html>ok</html>')
+
+    async def forbidden(self, request):
+        self._count(request)
+        return web.Response(status=403)
+
+    async def gzipped(self, request):
+        self._count(request)
+        body = gzip.compress('<html>Größe</html>'.encode('utf-8'))
+        return web.Response(body=body, headers={'Content-Encoding': 'gzip',
+                                                'Content-Type': 'text/html; charset=utf-8'})
+
+    async def slow(self, request):
+        self._count(request)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            self.in_flight -= 1
+        return web.Response(text=request.match_info['n'])
+
+
+async def _with_server(test):
+    server = StandInServer()
+    runner = web.AppRunner(server.app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    config = FetchConfig(concurrency_per_host=CONCURRENCY, max_retries=2, backoff_base=0.01, timeout=10)
+    try:
+        async with AsyncFetcher(config) as fetcher:
+            return await test(fetcher, f'http://127.0.0.1:{port}', server)
+    finally:
+        await runner.cleanup()
+
+
+def run(test):
+    return asyncio.run(_with_server(test))
+
+
+def test_missing_page_is_none():
+    async def test(fetcher, base, server):
+        assert await fetcher.fetch(f'{base}/missing') is None
+        assert server.calls['/missing'] == 1
+    run(test)
+
+
+def test_unavailable_is_retried_after_retry_after():
+    async def test(fetcher, base, server):
+        start = time.perf_counter()
+        assert await fetcher.fetch(f'{base}/busy') == '<html>ok</html>'
+        assert time.perf_counter() - start >= 1
+        assert server.calls['/busy'] == 2
+    run(test)
+
+
+def test_client_error_fails_without_retry():
+    async def test(fetcher, base, server):
+        with pytest.raises(FetchError, match='HTTP 403'):
+            await fetcher.fetch(f'{base}/forbidden')
+        assert server.calls['/forbidden'] == 1
+    run(test)
+
+
+def test_gzip_body_is_decoded():
+    async def test(fetcher, base, server):
+        assert await fetcher.fetch(f'{base}/gzip') == '<html>Größe</html>'
+    run(test)
+
+
+def test_requests_per_host_are_capped():
+    async def test(fetcher, base, server):
+        bodies = await asyncio.gather(*(fetcher.fetch(f'{base}/slow/{n}') for n in range(20)))
+        assert bodies == [str(n) for n in range(20)]
+        assert 1 < server.peak_in_flight <= CONCURRENCY
+    run(test)
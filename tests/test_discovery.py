@@ -0,0 +1,40 @@
+import asyncio
+
+from aiohttp import web
+
+from src.data.crawler import FetchConfig
+from src.data.discovery import discover_idps
+
+
+def listing_page(page: int, last_page: int) -> str:
+    runners = ''.join(f'<a href="?content=detail&amp;idp=P{page}R{n}">runner</a>' for n in range(3))
+    pager = ''.join(f'<a href="?pid=list&amp;page={n}">{n}</a>' for n in range(1, last_page + 1))
+    return f'<html>{runners}{pager}</html>'
+
+
+async def discover_with_broken_page():
+    async def listing(request):
+        page = int(request.query['page'])
+        if page == 2:
+            return web.Response(status=403)
+        if page > 4:
+            return web.Response(text='<html></html>')
+        return web.Response(text=listing_page(page, 4))
+
+    app = web.Application()
+    app.router.add_get('/{year}/', listing)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        return await discover_idps(2024, FetchConfig(max_retries=1, backoff_base=0.01),
+                                   list_url=f'http://127.0.0.1:{port}/{{year}}/?pid=list&page={{page}}')
+    finally:
+        await runner.cleanup()
+
+
+def test_failed_listing_page_is_skipped():
+    idps = asyncio.run(discover_with_broken_page())
+    assert idps == [f'P{page}R{n}' for page in (1, 3, 4) for n in range(3)]
@@ -0,0 +1,61 @@
+import sqlite3
+
+from src.data.label_store import UNDATED_YEAR, LabelStore, load_labels, open_label_store
+
+
+def write_csv(path, rows):
+    path.write_text(''.join(f'{bib},{name},{shoe}\n' for bib, name, shoe in rows), encoding='latin1')
+
+
+def test_pulled_csv_rows_are_merged_and_kept_on_export(tmp_path):
+    db, shared = str(tmp_path / 'labels.sqlite'), tmp_path / 'ShoeChoices.csv'
+    write_csv(shared, [('1', 'Ames', 'Nike Vaporfly')])
+    store = open_label_store(db, str(shared))
+    store.save('2', 'Baker', 'Hoka Rocket X')
+    store.export_csv(str(shared))
+    store.close()
+
+    # A teammate's labels arrive with a pull; one of them relabels a local bib
+    write_csv(shared, [('1', 'Ames', 'Nike Vaporfly'), ('2', 'Baker', 'Other'), ('3', 'Cole', 'Saucony Endorphin')])
+    labels = load_labels(db, str(shared))
+    assert dict(zip(labels['bib'], labels['shoeChoice'])) == {
+        '1': 'Nike Vaporfly', '2': 'Hoka Rocket X', '3': 'Saucony Endorphin'}
+
+    store = LabelStore(db)
+    write_csv(shared, [('4', 'Diaz', 'Asics Metaspeed')])
+    store.export_csv(str(shared))
+    store.close()
+    assert [line.split(',')[0] for line in shared.read_text(encoding='latin1').splitlines()] == ['1', '2', '3', '4']
+
+
+def test_labels_are_kept_per_year(tmp_path):
+    db, shared = str(tmp_path / 'labels.sqlite'), tmp_path / 'ShoeChoices.csv'
+    # An old three-column row, then the same bib in a later edition
+    write_csv(shared, [('7', 'Ames', 'Nike Vaporfly')])
+    with open(shared, 'a', encoding='latin1') as f:
+        f.write('7,Baker,Hoka Rocket X,2025\n')
+    store = open_label_store(db, str(shared), year=2025)
+    assert '7' in store
+    store.save('8', 'Cole', 'Other')
+    store.export_csv(str(shared))
+    store.close()
+
+    labels = load_labels(db, None)
+    assert sorted(zip(labels['year'], labels['bib'], labels['shoeChoice'])) == [
+        (UNDATED_YEAR, '7', 'Nike Vaporfly'), (2025, '7', 'Hoka Rocket X'), (2025, '8', 'Other')]
+    assert load_labels(db, None, years=[2025])['bib'].tolist() == ['7', '8']
+    assert '8,Cole,Other,2025' in shared.read_text(encoding='latin1').splitlines()
+
+
+def test_store_without_years_is_migrated(tmp_path):
+    db = str(tmp_path / 'labels.sqlite')
+    conn = sqlite3.connect(db)
+    conn.execute('CREATE TABLE labels (bib TEXT PRIMARY KEY, name TEXT, shoe TEXT NOT NULL, labeled REAL NOT NULL)')
+    conn.execute("INSERT INTO labels VALUES ('1', 'Ames', 'Nike Vaporfly', 1.0)")
+    conn.commit()
+    conn.close()
+
+    store = LabelStore(db, year=UNDATED_YEAR)
+    assert '1' in store
+    store.close()
+    assert load_labels(db, None)[['year', 'bib']].values.tolist() == [[UNDATED_YEAR, '1']]
@@ -0,0 +1,55 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.formula.api as smf
+
+from src.visualization.mixed_model import FORMULA_RHS, fit_random_intercept
+
+
+FAMILIES = ['Hoka', 'Nike', 'Other']
+CHECKPOINTS = ['10K', '20K', '30K', '40K']
+
+
+def synthetic_runners(n_per_family=20, seed=7):
+    """Percent changes with a family x distance effect, runner intercepts and noise."""
+    rng = np.random.default_rng(seed)
+    families = np.repeat(FAMILIES, n_per_family)
+    effect = rng.normal(0, 2, size=(len(FAMILIES), len(CHECKPOINTS)))
+    codes = pd.Categorical(families, categories=FAMILIES).codes
+    values = (effect[codes] + rng.normal(0, 3, size=(len(families), 1))
+              + rng.normal(0, 2, size=(len(families), len(CHECKPOINTS))))
+    return values, families
+
+
+def statsmodels_fit(values, families):
+    long_data = pd.DataFrame({
+        'PaceChange': values.ravel(),
+        'ShoeFamily': pd.Categorical(np.repeat(families, len(CHECKPOINTS)), categories=FAMILIES),
+        'Distance': pd.Categorical(np.tile(CHECKPOINTS, len(families)), categories=CHECKPOINTS),
+        'runner': np.repeat(np.arange(len(families)), len(CHECKPOINTS)),
+    })
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return smf.mixedlm(f'PaceChange ~ {FORMULA_RHS}', data=long_data, groups=long_data['runner'].to_numpy()).fit(reml=True)
+
+
+def test_closed_form_matches_mixedlm():
+    values, families = synthetic_runners()
+    fast = fit_random_intercept(values, families, CHECKPOINTS, FAMILIES)
+    reference = statsmodels_fit(values, families)
+
+    assert list(fast.params.index) == list(reference.params.index)
+    np.testing.assert_allclose(fast.params, reference.params, rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(fast.bse, reference.bse, rtol=1e-4)
+    assert fast.scale == pytest.approx(reference.scale, rel=1e-4)
+    assert fast.nobs == reference.nobs
+    assert fast.ngroups == len(families)
+
+
+def test_unbalanced_input_is_refused():
+    values, families = synthetic_runners()
+    values[0, 1] = np.nan
+    with pytest.raises(ValueError):
+        fit_random_intercept(values, families, CHECKPOINTS, FAMILIES)
@@ -0,0 +1,39 @@
+from src.data.photo_prefetch import PhotoPrefetcher
+
+
+class FakeDriver:
+    def __init__(self, fail_quit=False):
+        self.fail_quit = fail_quit
+
+    def minimize_window(self):
+        pass
+
+    def quit(self):
+        if self.fail_quit:
+            raise RuntimeError('chrome went away')
+
+
+def load_photos(driver, bib, name):
+    return 'window'
+
+
+def labeled_bibs(prefetcher):
+    bibs = []
+    for runner in prefetcher:
+        bibs.append(runner.bib)
+        runner.release()
+    return sorted(bibs)
+
+
+def test_iteration_ends_when_the_browser_does_not_start():
+    def create_driver():
+        raise RuntimeError('chrome not found')
+
+    prefetcher = PhotoPrefetcher([('1', 'Ames')], load_photos, create_driver, size=2)
+    assert labeled_bibs(prefetcher) == []
+
+
+def test_iteration_ends_when_quit_fails():
+    runners = [(str(bib), 'Runner') for bib in range(5)]
+    prefetcher = PhotoPrefetcher(runners, load_photos, lambda: FakeDriver(fail_quit=True), size=2)
+    assert labeled_bibs(prefetcher) == [str(bib) for bib in range(5)]
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.visualization import optimize, report
+
+
+CHECKPOINTS = ['0K', '5K', '10K', '15K', '20K', '25K', '30K', '35K', '40K', 'Finish Net']
+SHOES = ['Nike Vaporfly 3', 'Hoka Rocket X 2']
+
+
+def labelled_runners(n_per_shoe=optimize.MINIMUM_RUNNERS, seed=3):
+    rng = np.random.default_rng(seed)
+    n = n_per_shoe * len(SHOES)
+    slowdown = np.linspace(0, 1, len(CHECKPOINTS)) * rng.normal(-8, 3, size=(n, 1))
+    data = pd.DataFrame(slowdown + rng.normal(0, 1, size=(n, len(CHECKPOINTS))), columns=CHECKPOINTS)
+    data['0K'] = 0.0
+    data.insert(0, 'bib', [str(bib) for bib in range(n)])
+    data.insert(0, 'year', 2024)
+    data.insert(0, 'shoeChoice', np.repeat(SHOES, n_per_shoe))
+    seconds = pd.DataFrame(np.cumsum(rng.uniform(1100, 1500, size=(n, len(report.BOXPLOT_CHECKPOINTS))), axis=1),
+                           columns=report.BOXPLOT_CHECKPOINTS)
+    return data, seconds
+
+
+@pytest.fixture
+def counted_bootstrap(monkeypatch):
+    calls = []
+    bootstrap = report.bootstrap_curves
+
+    def counting(*args, **kwargs):
+        calls.append(kwargs.get('groups'))
+        return bootstrap(*args, **{**kwargs, 'resamples': 50})
+    monkeypatch.setattr(report, 'bootstrap_curves', counting)
+    return calls
+
+
+def test_unchanged_outputs_skip_the_bootstrap(tmp_path, counted_bootstrap):
+    data, seconds = labelled_runners()
+    status = report.render_report(report.build_jobs(data, seconds), str(tmp_path), workers=1)
+    assert set(status.values()) == {'rendered'}
+    assert len(counted_bootstrap) == 1
+
+    status = report.render_report(report.build_jobs(data, seconds), str(tmp_path), workers=1)
+    assert set(status.values()) == {'unchanged'}
+    assert len(counted_bootstrap) == 1
+
+
+def test_changing_one_group_keeps_the_other_groups_profile(tmp_path, counted_bootstrap):
+    data, seconds = labelled_runners()
+    report.render_report(report.build_jobs(data, seconds), str(tmp_path), workers=1)
+
+    hoka = data.index[data['shoeChoice'] == SHOES[1]]
+    data.loc[hoka[0], '40K'] += 1
+    status = report.render_report(report.build_jobs(data, seconds), str(tmp_path), workers=1)
+    assert status['speed_boxplot.png'] == 'unchanged'
+    assert status[f'profile_{report._slug("Vaporfly Family")}.png'] == 'unchanged'
+    assert status[f'profile_{report._slug("Hoka Family")}.png'] == 'rendered'
@@ -0,0 +1,37 @@
+import numpy as np
+
+from src.data.split_times import MISSING, SPLIT_COLUMNS, SPLIT_METERS
+from src.features.split_quality import (FLAG_IMPLAUSIBLE_SPEED, FLAG_MISSING, FLAG_NON_MONOTONIC,
+                                        FLAG_REPAIRED, screen_splits)
+
+
+def even_splits(finish_seconds=3 * 3600):
+    return np.round(finish_seconds * SPLIT_METERS / SPLIT_METERS[-1])
+
+
+def test_isolated_gap_is_interpolated_on_distance():
+    seconds = even_splits()
+    damaged = seconds.copy()
+    damaged[3] = MISSING
+    report = screen_splits(damaged[None, :], SPLIT_METERS, SPLIT_COLUMNS)
+    assert report.flags.tolist() == [FLAG_REPAIRED]
+    assert report.usable.tolist() == [True]
+    np.testing.assert_allclose(report.seconds[0], seconds, atol=1)
+
+
+def test_unrepairable_and_bad_splits_are_flagged():
+    seconds = np.tile(even_splits(), (4, 1))
+    seconds[0, 3:5] = MISSING       # two in a row: no neighbours to interpolate from
+    seconds[1, -1] = MISSING        # the finish has no split after it
+    seconds[2, 4] = seconds[2, 3]   # time stands still
+    seconds[3, 0] = 300             # a 5K in five minutes
+    report = screen_splits(seconds, SPLIT_METERS, SPLIT_COLUMNS)
+    assert report.flags.tolist() == [FLAG_MISSING, FLAG_MISSING, FLAG_NON_MONOTONIC, FLAG_IMPLAUSIBLE_SPEED]
+    assert not report.usable.any()
+
+
+def test_repair_can_be_turned_off():
+    seconds = even_splits()
+    seconds[3] = MISSING
+    report = screen_splits(seconds[None, :], SPLIT_METERS, SPLIT_COLUMNS, repair=False)
+    assert report.flags.tolist() == [FLAG_MISSING]
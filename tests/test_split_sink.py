@@ -0,0 +1,69 @@
+from src.data.detail_parser import RunnerRecord, Split
+from src.data.split_sink import SplitSink
+from src.data.split_times import SPLIT_COLUMNS, SPLIT_METERS
+
+
+def runner(bib, finish_seconds=3 * 3600):
+    splits = []
+    for label, meters in zip(SPLIT_COLUMNS, SPLIT_METERS):
+        seconds = round(finish_seconds * meters / SPLIT_METERS[-1])
+        clock = f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+        splits.append(Split(label, clock, '00:06:52', 8.74))
+    return RunnerRecord(name=f'Runner {bib}', bib=str(bib), splits=splits)
+
+
+def open_sink(tmp_path, **kwargs):
+    return SplitSink(str(tmp_path / 'Raw'), str(tmp_path / 'processed'), **kwargs)
+
+
+def output_bibs(tmp_path):
+    lines = (tmp_path / 'processed' / 'RaceTimeSeconds.csv').read_text().splitlines()[1:]
+    return [line.split(',')[1] for line in lines]
+
+
+def test_run_without_runners_keeps_existing_outputs(tmp_path):
+    with open_sink(tmp_path) as sink:
+        sink.append('a', runner(1))
+    with open_sink(tmp_path):
+        pass
+    assert output_bibs(tmp_path) == ['1']
+    assert not list(tmp_path.rglob('*.part'))
+
+
+def test_new_run_replaces_outputs_on_close(tmp_path):
+    with open_sink(tmp_path) as sink:
+        sink.append('a', runner(1))
+    with open_sink(tmp_path, chunk_size=1) as sink:
+        sink.append('b', runner(2))
+        # Flushed rows are staged until the run closes
+        assert output_bibs(tmp_path) == ['1']
+    assert output_bibs(tmp_path) == ['2']
+
+
+def test_resume_appends(tmp_path):
+    with open_sink(tmp_path) as sink:
+        sink.append('a', runner(1))
+    with open_sink(tmp_path, resume=True) as sink:
+        sink.append('b', runner(2))
+    assert output_bibs(tmp_path) == ['1', '2']
+
+
+def test_missing_splits_are_kept_and_repaired_by_the_store(tmp_path):
+    from src.data.race_store import build_store
+    from src.features.split_quality import FLAG_MISSING, FLAG_REPAIRED
+
+    gap, no_finish = runner(1), runner(2)
+    gap.splits[2] = Split('15K', '–', '–', None)
+    no_finish.splits[-1] = Split('Finish Net', '–', '–', None)
+    with open_sink(tmp_path) as sink:
+        assert sink.append('a', gap)
+        assert sink.append('b', no_finish)
+        assert not sink.append('c', RunnerRecord('Nobody', '3', [Split('5K', '–', '–', None)]))
+
+    raw = (tmp_path / 'Raw' / 'RaceTime.csv').read_text().splitlines()
+    assert raw[1].split(',')[4] == '-'
+    store = build_store(str(tmp_path / 'processed' / 'RaceTimeSeconds.csv'), str(tmp_path / 'store'), year=2024)
+    assert store['quality'].tolist() == [FLAG_REPAIRED, FLAG_MISSING]
+    # Interpolated on distance between the 10K and 20K splits
+    assert abs(store.loc[0, '15K'] - (store.loc[0, '10K'] + store.loc[0, '20K']) / 2) <= 0.5
+    assert store.loc[1, 'Finish Net'] == -1